@@ -1,76 +1,16 @@
 from main import logger, session, api_headers
 
+from api.graphql_operations import SEEKER_RESUMES
 from utils.request_utils import send_request, parse_json_response
 
 # Get full resume list function
 def get_full_resume_list():
     extended_resume_url = "https://dracula.robota.ua/?=SeekerResumes"
 
-    # GraphQL query to fetch all resumes, matching the browser's query
-    graphql_query = """
-    query SeekerResumes {
-    seekerResumes {
-        ...SeekerResumesInfo
-        __typename
-    }
-    }
-
-    fragment SeekerResumesInfo on ProfResume {
-    similarVacanciesCount
-    personal {
-        photoUrl
-        __typename
-    }
-    city {
-        id
-        __typename
-    }
-    id
-    resumeFilling {
-        percentage
-        __typename
-    }
-    title
-    views {
-        totalCount
-        __typename
-    }
-    updateDate
-    state {
-        ...ResumeState
-        __typename
-    }
-    __typename
-    }
-
-    fragment ResumeState on ResumeState {
-    state
-    availabilityState
-    isAnonymous
-    privacySettings {
-        hasHiddenPhones
-        __typename
-    }
-    isBannedByModerator
-    hiddenCompanies {
-        name
-        __typename
-    }
-    __typename
-    }
-    """
-
-    # Prepare the request body
-    request_body = {
-        "operationName": "SeekerResumes",
-        "variables": {},
-        "query": graphql_query
-    }
-
-    # Send the POST request to the resume API endpoint
+    # Send the POST request to the resume API endpoint, the query lives in the operation registry
 
     logger.info("Sending POST request to full resume list API")
-    resume_response = send_request("POST", extended_resume_url, headers=api_headers, json_data=request_body)
+    resume_response = send_request("POST", extended_resume_url, headers=api_headers, data=SEEKER_RESUMES.encode())
     
     resume_data = parse_json_response(resume_response)
     if resume_data:
@@ -81,4 +21,4 @@ def get_full_resume_list():
     return None
         
                 
-        
\ No newline at end of file
+        
@@ -1,6 +1,7 @@
-import requests
 import json
 
+from utils.credential_cache import dump_cookies, load_cookies, is_jwt_valid
+from utils.request_utils.transport import transport_for
 
 
 class Auth:
@@ -11,11 +12,17 @@ class Auth:
                  username, password, 
                  touch_url="https://robota.ua/auth/login", 
                  login_url="https://auth-api.robota.ua/Login",
-                 logger=None):
+                 logger=None,
+                 credential_cache=None,
+                 transport=None):
         
         self.session = session
         self.logger = logger
+        self.transport = transport or transport_for(session, logger)
         self.api_headers = api_headers
+        self.credential_cache = credential_cache
+        # (name, domain, path) of the cookies restored from the cache, dropped again by invalidate()
+        self._restored_cookies = set()
         
         """Initialize Auth class with credentials and URL"""
         self.username = username
@@ -25,27 +32,13 @@ class Auth:
 
     def _make_get_request(self):
         """Handle initial GET request to retrieve cookies using global session"""
-        try:
-            
-            get_response = self.session.get(self.touch_url, headers=self.api_headers)
-
-            if get_response.status_code == 200:
-                self.logger.debug("Touch GET request successful!")
-                # Check if the response contains the expected content
-
-                return True
-            else:
-                self.logger.error(f"GET request failed with status code: {get_response.status_code}")
-                self.logger.error(get_response.text[:500])
-                return False
-        except requests.exceptions.RequestException as e:
-            print(f"An error occurred during GET request: {e}")
-            self.logger.error(f"Request exception during GET: {e}")
-            return False
-        except Exception as e:
-            self.logger.error(f"An unexpected error occurred: {e}")
+        get_response = self.transport.request("GET", self.touch_url, expected_status=(200,), headers=self.api_headers)
+        if get_response is None:
             return False
 
+        self.logger.debug("Touch GET request successful!")
+        return True
+
     def _make_post_request(self):
         """Handle POST request with login credentials using global session"""
         payload = {
@@ -53,26 +46,19 @@ class Auth:
             "password": self.password
         }
         
-        try:
-            post_response = self.session.post(
-                self.login_url, 
-                headers=self.api_headers,
-                data=json.dumps(payload)
-            )
-            
-            if post_response.status_code == 200:
-                self.logger.debug("Login successful")
-                return post_response
-            else:
-                self.logger.error(f"POST request failed with status code: {post_response.status_code}")
-                return None
-        except requests.exceptions.RequestException as e:
-            self.logger.error(f"An error occurred during POST request: {e}")
-            return None
-        except Exception as e:
-            self.logger.error(f"An unexpected error occurred: {e}")
+        post_response = self.transport.request(
+            "POST",
+            self.login_url, 
+            expected_status=(200,),
+            headers=self.api_headers,
+            data=json.dumps(payload)
+        )
+        if post_response is None:
             return None
 
+        self.logger.debug("Login successful")
+        return post_response
+
     def _extract_token(self, post_response):
         """Extract JWT token from cookies or response body"""
         token = self.session.cookies.get("jwt-token", None)
@@ -90,12 +76,75 @@ class Auth:
             self.logger.error("Response body is not valid JSON. Cannot proceed to resume API.")
             return None
 
-    def login(self):
-        """Perform login and update headers with JWT token"""
+    def _restore_cached_session(self):
+        """Reuse a cached JWT token and cookies if the token has not expired yet"""
+        if not self.credential_cache:
+            return False
+
+        cached = self.credential_cache.load("robota", self.username)
+        if not cached or not cached.get("token"):
+            return False
+
+        if not is_jwt_valid(cached["token"]):
+            self.logger.info("Cached token expired. Performing full login.")
+            self.credential_cache.delete("robota", self.username)
+            return False
+
+        load_cookies(self.session.cookies, cached.get("cookies", []))
+        self._restored_cookies = {(cookie["name"], cookie.get("domain", ""), cookie.get("path", "/"))
+                                  for cookie in cached.get("cookies", [])}
+        self.api_headers["Referer"] = self.touch_url
+        self.api_headers["Authorization"] = f"Bearer {cached['token']}"
+        self.logger.info("Reusing cached token, login requests skipped")
+        return True
+
+    def _save_session(self, token):
+        """Store token and cookies for the next run"""
+        if self.credential_cache:
+            self.credential_cache.save("robota", self.username, {
+                "token": token,
+                "cookies": dump_cookies(self.session.cookies),
+            })
+
+    def invalidate(self):
+        """Drop the cached token, e.g. after the API answered 401.
+
+        The restored cookies go too: _extract_token reads the jwt-token cookie first, so a
+        login answering with the token only in its body would otherwise reuse the rejected one.
+        """
+        if self.credential_cache:
+            self.credential_cache.delete("robota", self.username)
+        self.api_headers.pop("Authorization", None)
+        for cookie in list(self.session.cookies):
+            if cookie.name == "jwt-token" or (cookie.name, cookie.domain, cookie.path) in self._restored_cookies:
+                self.session.cookies.clear(cookie.domain, cookie.path, cookie.name)
+        self._restored_cookies = set()
+
+    def login(self, force=False):
+        """Perform login and update headers with JWT token.
+
+        With a credential cache the stored token is reused while it is valid;
+        `force=True` drops it and always performs the full login.
+        """
+        if force:
+            self.invalidate()
+        elif self._restore_cached_session():
+            return self.api_headers
+
+        token = self._fresh_login()
+        if token:
+            self.api_headers["Authorization"] = f"Bearer {token}"
+            self.logger.info("Token extracted successfully")
+            self._save_session(token)
+            return self.api_headers
+        return False
+
+    def _fresh_login(self):
+        """Run the touch GET and login POST, return the JWT token or None"""
         # Step 1: Make GET request
         if not self._make_get_request():
             self.logger.error("Toching GET request failed. Cannot proceed to POST request.")
-            return False
+            return None
         
         # Update headers with updated cookies
         # self.api_headers["Cookie"] = "; ".join([f"{key}={value}" for key, value in self.session.cookies.items()])
@@ -107,13 +156,7 @@ class Auth:
         post_response = self._make_post_request()
         if not post_response:
             self.logger.error("Login POST request failed. Cannot proceed to token extraction.")
-            return False
-
-        # Step 3: Extract token and update global headers
-        token = self._extract_token(post_response)
-        if token:
-            self.api_headers["Authorization"] = f"Bearer {token}"
-            self.logger.info("Token extracted successfully")
-            return self.api_headers
-        return False
+            return None
 
+        # Step 3: Extract token
+        return self._extract_token(post_response)
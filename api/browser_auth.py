@@ -0,0 +1,132 @@
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import WebDriverException, TimeoutException
+
+from api.auth import Auth
+
+
+# Resources that are never needed to log in or click buttons
+BLOCKED_URLS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*facebook.net*", "*hotjar.com*", "*clarity.ms*",
+]
+
+
+def build_chrome_options(headless=False):
+    """Chrome options shared by the Selenium script and the browser login"""
+    chrome_options = Options()
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    if headless:
+        chrome_options.add_argument("--headless=new")
+        chrome_options.add_argument("--window-size=1920,1080")
+    return chrome_options
+
+
+def block_resources(driver):
+    """Block images, fonts and analytics through CDP"""
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URLS})
+
+
+def browser_login(driver, wait, username, password, logger, login_url="https://robota.ua/auth/login"):
+    """Fill in the robota.ua login form and wait until the browser leaves the login page"""
+    logger.info(f"Navigating to login page")
+    driver.get(login_url)
+
+    # Input username as soon as the field is usable
+    logger.info("Entering username")
+    username_input = wait.until(EC.element_to_be_clickable((By.ID, 'otp-username')))
+    username_input.send_keys(username)
+    username_input.send_keys('\n')  # Press Enter to validate the email
+
+    # Input password once the field appears
+    logger.info("Entering password")
+    password_input = wait.until(EC.visibility_of_element_located((By.CSS_SELECTOR, 'input[type="password"]')))
+    password_input.send_keys(password)
+
+    # Submit the login form
+    logger.info("Clicking login button")
+    login_button = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, 'button[type="button"]')))
+    login_button.click()
+    # Login is done when the browser leaves the login page
+    wait.until(lambda d: "/auth/login" not in d.current_url)
+
+
+class BrowserAuth(Auth):
+    """Auth that logs in through a real browser and hands the session over to requests.
+
+    The browser is only used for the login itself: its cookies and the jwt-token are
+    copied into the shared requests.Session / api_headers and the browser is shut down,
+    so the listing and popups run through Robota_API as usual.
+    """
+
+    def __init__(self,
+                 session,
+                 api_headers,
+                 username, password,
+                 touch_url="https://robota.ua/auth/login",
+                 login_url="https://auth-api.robota.ua/Login",
+                 logger=None,
+                 credential_cache=None,
+                 driver_path=None,
+                 headless=True,
+                 wait_timeout=20):
+        super().__init__(session, api_headers, username, password,
+                         touch_url=touch_url, login_url=login_url,
+                         logger=logger, credential_cache=credential_cache)
+        self.driver_path = driver_path
+        self.headless = headless
+        self.wait_timeout = wait_timeout
+
+    def _export_cookies(self, driver):
+        """Copy browser cookies into the requests session"""
+        for cookie in driver.get_cookies():
+            self.session.cookies.set(
+                cookie["name"],
+                cookie["value"],
+                domain=cookie.get("domain", ""),
+                path=cookie.get("path", "/"),
+                expires=cookie.get("expiry"),
+                secure=cookie.get("secure", False),
+            )
+
+    def _fresh_login(self):
+        """Log in with Selenium, export cookies and return the JWT token or None"""
+        service = Service(self.driver_path) if self.driver_path else Service()
+        driver = None
+        try:
+            self.logger.info("Starting browser for login handoff")
+            driver = webdriver.Chrome(service=service, options=build_chrome_options(self.headless))
+            if self.headless:
+                block_resources(driver)
+
+            browser_login(driver, WebDriverWait(driver, self.wait_timeout),
+                          self.username, self.password, self.logger, login_url=self.touch_url)
+
+            self._export_cookies(driver)
+            self.api_headers["Referer"] = self.touch_url
+
+            token = self.session.cookies.get("jwt-token", None)
+            if not token:
+                token = driver.execute_script("return window.localStorage.getItem('jwt-token')")
+            if not token:
+                self.logger.error("jwt-token not found after browser login")
+            return token
+
+        except (WebDriverException, TimeoutException) as e:
+            self.logger.error(f"Browser login failed: {e}")
+            return None
+        finally:
+            if driver:
+                try:
+                    self.logger.info("Closing browser")
+                    driver.quit()
+                except Exception as e:
+                    self.logger.error(f"Error while closing browser: {str(e)}")
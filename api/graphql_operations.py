@@ -0,0 +1,219 @@
+"""Registry of the GraphQL operations sent to dracula.robota.ua.
+
+Every document is stored once, minified, hashed and pre-encoded: the static part of
+the JSON request body is serialized to bytes at registration time, so sending an
+operation only serializes its variables. Operations can also be sent as Automatic
+Persisted Queries (sha256 hash only; full text with the hash once the server asks for
+it, which stores the hash for later requests).
+"""
+import hashlib
+import json
+import re
+import threading
+from typing import Callable, Dict, Iterable, Optional
+
+
+class GraphQLOperation:
+    """One named GraphQL document with its pre-encoded request body prefixes"""
+
+    def __init__(self, name: str, query: str):
+        self.name = name
+        # Collapse indentation and newlines, GraphQL does not care and it halves the upload
+        self.query = " ".join(query.split())
+        self.sha256 = hashlib.sha256(self.query.encode("utf-8")).hexdigest()
+
+        encoded_name = json.dumps(self.name).encode("utf-8")
+        persisted_extension = json.dumps(
+            {"persistedQuery": {"version": 1, "sha256Hash": self.sha256}}, separators=(",", ":")
+        ).encode("utf-8")
+        self._full_prefix = (b'{"operationName":' + encoded_name
+                             + b',"query":' + json.dumps(self.query).encode("utf-8")
+                             + b',"variables":')
+        self._persisted_prefix = (b'{"operationName":' + encoded_name
+                                  + b',"extensions":' + persisted_extension
+                                  + b',"variables":')
+        # Full text plus hash: the APQ retry after PersistedQueryNotFound, which registers the hash
+        self._registering_prefix = (b'{"operationName":' + encoded_name
+                                    + b',"query":' + json.dumps(self.query).encode("utf-8")
+                                    + b',"extensions":' + persisted_extension
+                                    + b',"variables":')
+        self._full_without_variables = self._full_prefix + b"{}}"
+        self._persisted_without_variables = self._persisted_prefix + b"{}}"
+        self._registering_without_variables = self._registering_prefix + b"{}}"
+
+    def encode(self, variables: Optional[dict] = None, persisted: bool = False, register: bool = False) -> bytes:
+        """JSON request body; with `persisted` the query text is replaced by its APQ hash,
+        with `register` it is sent along with the hash so the server stores it"""
+        if persisted:
+            prefix, without_variables = self._persisted_prefix, self._persisted_without_variables
+        elif register:
+            prefix, without_variables = self._registering_prefix, self._registering_without_variables
+        else:
+            prefix, without_variables = self._full_prefix, self._full_without_variables
+        if not variables:
+            return without_variables
+        return prefix + json.dumps(variables, separators=(",", ":")).encode("utf-8") + b"}"
+
+
+def is_persisted_query_not_found(body: bytes) -> bool:
+    """Cheap check on the raw response, before any JSON parsing"""
+    return b"PersistedQueryNotFound" in body or b"PERSISTED_QUERY_NOT_FOUND" in body
+
+
+def is_persisted_query_not_supported(body: bytes) -> bool:
+    return b"PersistedQueryNotSupported" in body or b"PERSISTED_QUERY_NOT_SUPPORTED" in body
+
+
+class OperationRegistry:
+    """Name -> GraphQLOperation, with lazily built operations for generated documents"""
+
+    def __init__(self):
+        self._operations: Dict[str, GraphQLOperation] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, query: str) -> GraphQLOperation:
+        operation = GraphQLOperation(name, query)
+        with self._lock:
+            self._operations[name] = operation
+        return operation
+
+    def get(self, name: str) -> GraphQLOperation:
+        return self._operations[name]
+
+    def get_or_build(self, name: str, build_query: Callable[[], str]) -> GraphQLOperation:
+        """Return a registered operation or build, register and cache it on first use"""
+        operation = self._operations.get(name)
+        if operation is None:
+            operation = self.register(name, build_query())
+        return operation
+
+
+registry = OperationRegistry()
+
+
+SEEKER_RESUMES = registry.register("SeekerResumes", """
+    query SeekerResumes {
+    seekerResumes {
+        ...SeekerResumesInfo
+        __typename
+    }
+    }
+
+    fragment SeekerResumesInfo on ProfResume {
+    similarVacanciesCount
+    personal {
+        photoUrl
+        __typename
+    }
+    city {
+        id
+        __typename
+    }
+    id
+    resumeFilling {
+        percentage
+        __typename
+    }
+    title
+    views {
+        totalCount
+        __typename
+    }
+    updateDate
+    state {
+        ...ResumeState
+        __typename
+    }
+    __typename
+    }
+
+    fragment ResumeState on ResumeState {
+    state
+    availabilityState
+    isAnonymous
+    privacySettings {
+        hasHiddenPhones
+        __typename
+    }
+    isBannedByModerator
+    hiddenCompanies {
+        name
+        __typename
+    }
+    __typename
+    }
+""")
+
+
+# Fields every Resume record needs, always added to lean queries
+REQUIRED_RESUME_FIELDS = ("id", "state.state")
+_FIELD_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def _render_selection(tree: dict) -> str:
+    return " ".join(name if not children else f"{name} {{ {_render_selection(children)} }}"
+                    for name, children in tree.items())
+
+
+def seeker_resumes_lean(fields: Iterable[str]) -> GraphQLOperation:
+    """SeekerResumes query selecting only the given dotted field paths (e.g. "state.state").
+
+    The document is generated once per distinct field set and cached in the registry.
+    """
+    field_set = sorted(set(fields) | set(REQUIRED_RESUME_FIELDS))
+    for field in field_set:
+        if not all(_FIELD_NAME.match(part) for part in field.split(".")):
+            raise ValueError(f"Invalid GraphQL field path: {field!r}")
+    name = "SeekerResumesLean" + hashlib.sha1(",".join(field_set).encode("utf-8")).hexdigest()[:8]
+
+    def build_query():
+        tree = {}
+        for field in field_set:
+            node = tree
+            for part in field.split("."):
+                node = node.setdefault(part, {})
+        return f"query {name} {{ seekerResumes {{ {_render_selection(tree)} }} }}"
+
+    return registry.get_or_build(name, build_query)
+
+
+# Selection set of the UpdateSeekerProfResumeSortDate payload, shared by single and batched popups
+POPUP_SELECTION = """
+    profResume {
+        id
+        __typename
+    }
+    errors {
+        ... on ProfResumeDoesNotExist {
+            message
+            __typename
+        }
+        ... on ProfResumeDoesNotBelongToSeeker {
+            message
+            __typename
+        }
+        __typename
+    }
+    __typename
+"""
+
+UPDATE_SORT_DATE = registry.register("UpdateSeekerProfResumeSortDate", """
+    mutation UpdateSeekerProfResumeSortDate($input: UpdateSeekerProfResumeSortDateInput!) {
+        updateSeekerProfResumeSortDate(input: $input) {%s}
+    }
+""" % POPUP_SELECTION)
+
+
+def update_sort_date_batch(size: int) -> GraphQLOperation:
+    """Aliased popup mutation for `size` resumes (r0..rN with $input0..$inputN), built once per size"""
+    name = f"UpdateSeekerProfResumeSortDateBatch{size}"
+
+    def build_query():
+        variable_defs = ", ".join(f"$input{index}: UpdateSeekerProfResumeSortDateInput!" for index in range(size))
+        fields = " ".join(
+            f"r{index}: updateSeekerProfResumeSortDate(input: $input{index}) {{{POPUP_SELECTION}}}"
+            for index in range(size)
+        )
+        return f"mutation {name}({variable_defs}) {{ {fields} }}"
+
+    return registry.get_or_build(name, build_query)
@@ -1,14 +1,12 @@
-# popup_profile_url = https://djinni.co/ajax/reactivate/
-# method = POST
-# headers = api_headers
-
 import requests
-from bs4 import BeautifulSoup
-from requests.exceptions import RequestException, Timeout, ConnectionError
 import logging
-from typing import Optional, Dict
+from typing import Iterator, Optional, Dict
 
 from api.jinni_api_headers import jinny_headers
+from api.jinni_parsing import InboxThread, extract_csrf_token, iter_inbox_threads
+from utils.credential_cache import dump_cookies, load_cookies
+from utils.request_utils.transport import transport_for
+from utils.request_utils.connection_pool import build_session
 
 class Jinny_API:
     """API client for interacting with Djinni.co"""
@@ -25,9 +23,13 @@ class Jinny_API:
         login_url: str = "https://djinni.co/login?from=frontpage_main",
         logger: Optional[logging.Logger] = None,
         timeout: int = 10,
+        credential_cache=None,
+        probe_url: str = "https://djinni.co/my/profile/",
+        session: Optional[requests.Session] = None,
+        reactivate_url: str = "https://djinni.co/ajax/reactivate/",
     ):
         """Initialize the API client with credentials and configuration."""
-        self.session = requests.Session()
+        self.session = session or build_session()
         self.username = username
         self.password = password
         self.touch_url = touch_url
@@ -35,7 +37,12 @@ class Jinny_API:
         self.timeout = timeout
         self.logger = logger or logging.getLogger(__name__)
         self.headers = self.DEFAULT_HEADERS.copy()
+        self.credential_cache = credential_cache
+        self.probe_url = probe_url
+        self.reactivate_url = reactivate_url
+        self.csrf_token: Optional[str] = None
         self._setup_logging()
+        self.transport = transport_for(self.session, self.logger)
 
     def _setup_logging(self) -> None:
         """Configure logging if not provided."""
@@ -44,45 +51,30 @@ class Jinny_API:
             self.logger.debug("Logging configured for JinnyAPI")
 
     def _make_request(self, method: str, url: str, **kwargs) -> Optional[requests.Response]:
-        """Generic request handler with error handling."""
-        self.logger.info(f"Making {method} request to {url}")
-        try:
-            response = self.session.request(
-                method,
-                url,
-                headers=self.headers,
-                timeout=self.timeout,
-                **kwargs
-            )
-            response.raise_for_status()  # Raise exception for 4xx/5xx status codes
-            self.logger.info(f"{method} request to {url} successful. Status code: {response.status_code}")
-            return response
-        except Timeout:
-            self.logger.error(f"Timeout after {self.timeout}s for {method} request to {url}")
-            return None
-        except ConnectionError:
-            self.logger.error(f"Connection error for {method} request to {url}")
-            return None
-        except RequestException as e:
-            self.logger.error(f"Request failed for {url}: {str(e)}")
-            return None
-        except Exception as e:
-            self.logger.error(f"Unexpected error for {method} request to {url}: {str(e)}")
-            return None
+        """Generic request handler, errors and retries are handled by the shared transport."""
+        self.logger.info("Making %s request to %s", method, url)
+        response = self.transport.request(
+            method,
+            url,
+            headers={**self.headers, **kwargs.pop("headers", {})},
+            timeout=self.timeout,
+            **kwargs
+        )
+        if response is not None:
+            self.logger.info("%s request to %s successful. Status code: %s", method, url, response.status_code)
+        return response
 
     def _extract_csrf_token(self, response: requests.Response) -> Optional[str]:
         """Extract CSRF token from login page response."""
         try:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            csrf_input = soup.find('input', {'name': 'csrfmiddlewaretoken'})
-            if not csrf_input or 'value' not in csrf_input.attrs:
+            token = extract_csrf_token(response.text)
+            if not token:
                 self.logger.error("CSRF token not found in login page")
                 return None
-            token = csrf_input['value']
-            self.logger.debug(f"Extracted CSRF token: {token[:10]}...")  # Log partial token for security
+            self.logger.debug("Extracted CSRF token: %s...", token[:10])  # Log partial token for security
             return token
         except Exception as e:
-            self.logger.error(f"Failed to parse CSRF token: {str(e)}")
+            self.logger.error("Failed to parse CSRF token: %s", e)
             return None
 
     def _touch_site(self) -> bool:
@@ -115,14 +107,47 @@ class Jinny_API:
         )
         
         if response and response.status_code == 200:
-            self.logger.info(f"Login successful! Final URL: {response.url}")
+            self.logger.info("Login successful! Final URL: %s", response.url)
             return response
-        self.logger.error(f"Login failed. Final URL: {response.url if response else 'None'}")
+        self.logger.error("Login failed. Final URL: %s", response.url if response else None)
         return None
 
-    def login(self) -> bool:
-        """Perform complete login sequence."""
-        self.logger.info(f"Starting login process on behalf of {self.username}")
+    def _restore_cached_session(self) -> bool:
+        """Load cached cookies and confirm with one authenticated probe that they still work."""
+        if not self.credential_cache:
+            return False
+
+        cached = self.credential_cache.load("djinni", self.username)
+        if not cached or not cached.get("cookies"):
+            return False
+
+        load_cookies(self.session.cookies, cached["cookies"])
+        # Anonymous visitors get redirected to the login page, so anything but 200 means a stale session
+        response = self._make_request("GET", self.probe_url, allow_redirects=False)
+        if not response or response.status_code != 200:
+            self.logger.info("Cached session rejected by probe. Performing full login.")
+            self.session.cookies.clear()
+            self.credential_cache.delete("djinni", self.username)
+            return False
+
+        self.csrf_token = self.session.cookies.get("csrftoken") or cached.get("csrf_token")
+        self.logger.info("Reusing cached session, login requests skipped")
+        return True
+
+    def _save_session(self) -> None:
+        """Store the cookie jar and CSRF token for the next run."""
+        if self.credential_cache:
+            self.credential_cache.save("djinni", self.username, {
+                "cookies": dump_cookies(self.session.cookies),
+                "csrf_token": self.csrf_token,
+            })
+
+    def login(self, force: bool = False) -> bool:
+        """Perform complete login sequence, unless a cached session is still valid."""
+        if not force and self._restore_cached_session():
+            return True
+
+        self.logger.info("Starting login process on behalf of %s", self.username)
 
         # Step 1: Touch site to gather initial cookies
         if not self._touch_site():
@@ -146,9 +171,64 @@ class Jinny_API:
             self.logger.error("Login POST request failed.")
             return False
         self.logger.info("Login POST request successful.")
+
+        # Django rotates the CSRF token on login, prefer the fresh cookie value
+        self.csrf_token = self.session.cookies.get("csrftoken") or csrf_token
+        self._save_session()
         return True
 
     def get_authenticated_page(self, url: str) -> Optional[requests.Response]:
         """Fetch a page using the authenticated session."""
         response = self._make_request("GET", url)
         return response if response else None
+
+    def reactivate(self, retry_login: bool = True) -> bool:
+        """Bump the profile to the top of the candidate list (Djinni's "popup").
+
+        Reuses the authenticated session and cached CSRF token. A rejected token
+        (403) or an expired session triggers one fresh login and one more attempt.
+        """
+        self.csrf_token = self.csrf_token or self.session.cookies.get("csrftoken")
+        if not self.csrf_token:
+            self.logger.error("No CSRF token available, log in before reactivating the profile")
+            return False
+
+        response = self._make_request(
+            "POST",
+            self.reactivate_url,
+            headers={
+                "X-CSRFToken": self.csrf_token,
+                "X-Requested-With": "XMLHttpRequest",
+                "Origin": "https://djinni.co",
+                "Referer": self.probe_url,
+            },
+            # Anything but 200 (e.g. a redirect to the login page) means the bump did not happen
+            expected_status=(200,),
+            allow_redirects=False,
+        )
+        if response is None:
+            if retry_login and self.transport.last_status_code in (302, 401, 403):
+                self.logger.info("Reactivation rejected, logging in again")
+                self.csrf_token = None
+                if self.login(force=True):
+                    return self.reactivate(retry_login=False)
+            self.logger.error("Profile reactivation failed")
+            return False
+
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = None
+        error = payload.get("error") if isinstance(payload, dict) else None
+        if error:
+            self.logger.error("Profile reactivation refused: %s", error)
+            return False
+        self.logger.info("Profile of %s reactivated", self.username)
+        return True
+
+    def iter_inbox_threads(self, url: str = "https://djinni.co/my/inbox/") -> Optional[Iterator[InboxThread]]:
+        """Fetch an inbox page and return a generator of its threads, or None if the fetch failed."""
+        response = self.get_authenticated_page(url)
+        if response is None:
+            return None
+        return iter_inbox_threads(response.text)
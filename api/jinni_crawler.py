@@ -0,0 +1,242 @@
+"""Incremental crawler for paginated djinni.co listings (inbox threads, job postings).
+
+Page 1 is fetched on its own. On a re-sync it usually already holds the newest
+item seen last time, or is unchanged, and the crawl stops there after a single
+request. Deeper pages are then fetched `max_workers` at a time and processed in
+page order. The crawl stops at the first page that is unchanged since the last
+sync, that reaches an item known from the last sync, or that is past the end of
+the listing.
+
+Which items count as known depends on the listing order. Listings sorted newest
+first by ID (job postings) stop at the newest ID of the last sync. The inbox is
+sorted by thread activity: a new message moves a known thread back to the top,
+so there every item's content hash is kept and the crawl stops at the first
+item that is unchanged since the last sync.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+
+from api.jinni_parsing import iter_inbox_threads, iter_job_postings
+
+
+class Listing:
+    """A paginated listing: page URL template, the parser for its items, and whether
+    it is sorted newest first by item ID (otherwise items are compared by content)"""
+
+    def __init__(self, name: str, url_template: str, parse: Callable[[str], Iterable],
+                 ordered_by_id: bool = False):
+        self.name = name
+        self.url_template = url_template
+        self.parse = parse
+        self.ordered_by_id = ordered_by_id
+
+    def page_url(self, page: int) -> str:
+        return self.url_template.format(page=page)
+
+
+INBOX = Listing("inbox", "https://djinni.co/my/inbox/?page={page}", iter_inbox_threads)
+JOBS = Listing("jobs", "https://djinni.co/jobs/?page={page}", iter_job_postings, ordered_by_id=True)
+LISTINGS = {listing.name: listing for listing in (INBOX, JOBS)}
+
+
+def page_hash(items: list) -> str:
+    """Hash of the extracted items rather than the raw HTML, which changes on every
+    request (CSRF tokens, timestamps) even when the listing itself did not"""
+    payload = json.dumps([item.to_dict() for item in items], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def item_hash(item) -> str:
+    """Hash of one item's extracted fields, e.g. an inbox thread's preview and unread flag"""
+    payload = json.dumps(item.to_dict(), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CrawlState:
+    """SQLite record of the per-page content hash, the newest item seen per listing
+    and, for listings not ordered by ID, the content hash of every item"""
+
+    def __init__(self, db_path: str = os.path.join("cache", "djinni_crawl.sqlite")):
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir, exist_ok=True)
+        # The crawler's worker threads only fetch, all state access stays on the calling thread
+        self.connection = sqlite3.connect(db_path)
+        self.connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                account TEXT NOT NULL,
+                listing TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                content_hash TEXT NOT NULL,
+                synced_at REAL NOT NULL,
+                PRIMARY KEY (account, listing, page)
+            );
+            CREATE TABLE IF NOT EXISTS listings (
+                account TEXT NOT NULL,
+                listing TEXT NOT NULL,
+                last_seen_id TEXT,
+                synced_at REAL NOT NULL,
+                PRIMARY KEY (account, listing)
+            );
+            CREATE TABLE IF NOT EXISTS items (
+                account TEXT NOT NULL,
+                listing TEXT NOT NULL,
+                item_id TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                synced_at REAL NOT NULL,
+                PRIMARY KEY (account, listing, item_id)
+            );
+            """
+        )
+
+    def page_hashes(self, account: str, listing: str) -> Dict[int, str]:
+        return dict(self.connection.execute(
+            "SELECT page, content_hash FROM pages WHERE account = ? AND listing = ?", (account, listing)
+        ))
+
+    def item_hashes(self, account: str, listing: str) -> Dict[str, str]:
+        return dict(self.connection.execute(
+            "SELECT item_id, content_hash FROM items WHERE account = ? AND listing = ?", (account, listing)
+        ))
+
+    def last_seen_id(self, account: str, listing: str) -> Optional[str]:
+        row = self.connection.execute(
+            "SELECT last_seen_id FROM listings WHERE account = ? AND listing = ?", (account, listing)
+        ).fetchone()
+        return row[0] if row else None
+
+    def save(self, account: str, listing: str, hashes: Dict[int, str], last_seen_id: Optional[str],
+             item_hashes: Optional[Dict[str, str]] = None) -> None:
+        now = time.time()
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO pages (account, listing, page, content_hash, synced_at) VALUES (?, ?, ?, ?, ?)",
+                [(account, listing, page, content_hash, now) for page, content_hash in hashes.items()],
+            )
+            if last_seen_id is not None:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO listings (account, listing, last_seen_id, synced_at) VALUES (?, ?, ?, ?)",
+                    (account, listing, last_seen_id, now),
+                )
+            if item_hashes:
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO items (account, listing, item_id, content_hash, synced_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [(account, listing, item_id, content_hash, now) for item_id, content_hash in item_hashes.items()],
+                )
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+class JinnyCrawler:
+    """Walks paginated listings with a logged-in Jinny_API, fetching up to `max_workers` pages at once"""
+
+    def __init__(self, djinny, state: CrawlState, logger=None, max_workers: int = 4, max_pages: int = 50):
+        self.djinny = djinny
+        self.state = state
+        self.logger = logger or logging.getLogger(__name__)
+        self.max_workers = max_workers
+        self.max_pages = max_pages
+
+    def _fetch(self, listing: Listing, page: int):
+        """(page, html or None, status); runs in a worker thread, where last_status_code is per thread"""
+        response = self.djinny.get_authenticated_page(listing.page_url(page))
+        status = response.status_code if response is not None else self.djinny.transport.last_status_code
+        return page, response.text if response is not None else None, status
+
+    def _fetch_pages(self, executor, listing: Listing, pages: range) -> List[tuple]:
+        if len(pages) == 1:
+            return [self._fetch(listing, pages[0])]
+        return list(executor.map(lambda page: self._fetch(listing, page), pages))
+
+    def crawl(self, listing: Listing, account: Optional[str] = None) -> Optional[dict]:
+        """Sync one listing; returns the new items and request counts, or None if page 1 failed"""
+        account = account or self.djinny.username
+        known_hashes = self.state.page_hashes(account, listing.name)
+        last_seen_id = self.state.last_seen_id(account, listing.name) if listing.ordered_by_id else None
+        known_items = {} if listing.ordered_by_id else self.state.item_hashes(account, listing.name)
+
+        result = {"listing": listing.name, "items": [], "pages_fetched": 0, "stopped_by": "max_pages"}
+        new_hashes = {}
+        new_item_hashes = {}
+        collected_ids = set()
+        newest_id = None
+        complete = True
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            next_page = 1
+            while next_page <= self.max_pages:
+                # Page 1 alone, then windows of max_workers pages
+                window = 1 if next_page == 1 else min(self.max_workers, self.max_pages - next_page + 1)
+                fetched = self._fetch_pages(executor, listing, range(next_page, next_page + window))
+                result["pages_fetched"] += len(fetched)
+                next_page += window
+
+                stop = None
+                for page, html, status in fetched:
+                    if html is None:
+                        if status == 404:
+                            stop = "end"
+                        else:
+                            self.logger.error(f"Failed to fetch {listing.name} page {page} (status {status})")
+                            stop, complete = "error", False
+                        break
+
+                    items = list(listing.parse(html))
+                    if not items:
+                        stop = "end"
+                        break
+                    if page == 1:
+                        newest_id = items[0].id
+
+                    content_hash = page_hash(items)
+                    if known_hashes.get(page) == content_hash:
+                        stop = "unchanged"
+                        break
+                    new_hashes[page] = content_hash
+
+                    ids = [item.id for item in items]
+                    if collected_ids.issuperset(ids):
+                        # Past the last page some listings repeat the last page instead of returning 404
+                        stop = "end"
+                        break
+                    # Items before `cutoff` are new or changed, from `cutoff` on they were seen last time
+                    cutoff = None
+                    if listing.ordered_by_id:
+                        if last_seen_id in ids:
+                            cutoff = ids.index(last_seen_id)
+                    else:
+                        content_hashes = [item_hash(item) for item in items]
+                        cutoff = next((index for index, (item_id, content_hash) in enumerate(zip(ids, content_hashes))
+                                       if known_items.get(item_id) == content_hash), None)
+                        new_item_hashes.update(zip(ids, content_hashes))
+
+                    fresh = items if cutoff is None else items[:cutoff]
+                    result["items"].extend(item for item in fresh if item.id not in collected_ids)
+                    collected_ids.update(ids)
+                    if cutoff is not None:
+                        stop = "last_seen"
+                        break
+
+                if stop is not None:
+                    result["stopped_by"] = stop
+                    break
+
+        if newest_id is None and not complete:
+            return None
+        # After a failed page nothing is saved: the next sync must not find the pages before it
+        # "unchanged" and stop short of the page that failed, nor move the last-seen marker past it
+        if complete:
+            self.state.save(account, listing.name, new_hashes, newest_id if listing.ordered_by_id else None,
+                            new_item_hashes)
+        self.logger.info(f"{listing.name} sync for {account}: {len(result['items'])} new items, "
+                         f"{result['pages_fetched']} pages fetched, stopped by {result['stopped_by']}")
+        return result
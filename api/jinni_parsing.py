@@ -0,0 +1,137 @@
+"""Low-memory HTML extraction for djinni.co pages.
+
+Only the elements we need are materialized. selectolax is used when it is
+installed; otherwise BeautifulSoup with a SoupStrainer parses the page, using
+lxml when available and html.parser as the last resort. Inbox threads come out
+of a generator as small __slots__ records, never as a full document tree.
+"""
+import re
+from typing import Iterator, Optional
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    from selectolax.parser import HTMLParser
+except ImportError:
+    HTMLParser = None
+
+try:
+    import lxml  # noqa: F401
+    BS4_PARSER = "lxml"
+except ImportError:
+    BS4_PARSER = "html.parser"
+
+BACKEND = "selectolax" if HTMLParser is not None else BS4_PARSER
+
+# /my/inbox/<thread id>/ links, one or more per inbox row
+THREAD_HREF = re.compile(r"^(?:https://djinni\.co)?/my/inbox/(\d+)/?")
+# /jobs/<job id>-<slug>/ links on job listing pages
+JOB_HREF = re.compile(r"^(?:https://djinni\.co)?/jobs/(\d+)-")
+
+_CSRF_STRAINER = SoupStrainer("input", attrs={"name": "csrfmiddlewaretoken"})
+_THREAD_STRAINER = SoupStrainer("a", href=THREAD_HREF)
+_JOB_STRAINER = SoupStrainer("a", href=JOB_HREF)
+
+
+class InboxThread:
+    __slots__ = ("id", "url", "correspondent", "subject", "preview", "unread")
+
+    def __init__(self, id, url, correspondent=None, subject=None, preview=None, unread=False):
+        self.id = id
+        self.url = url
+        self.correspondent = correspondent
+        self.subject = subject
+        self.preview = preview
+        self.unread = unread
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self) -> str:
+        return f"InboxThread(id={self.id!r}, correspondent={self.correspondent!r}, unread={self.unread!r})"
+
+
+class JobPosting:
+    __slots__ = ("id", "url", "title")
+
+    def __init__(self, id, url, title=None):
+        self.id = id
+        self.url = url
+        self.title = title
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self) -> str:
+        return f"JobPosting(id={self.id!r}, title={self.title!r})"
+
+
+def extract_csrf_token(html: str) -> Optional[str]:
+    """Value of the csrfmiddlewaretoken input, parsing nothing but matching inputs"""
+    if HTMLParser is not None:
+        node = HTMLParser(html).css_first('input[name="csrfmiddlewaretoken"]')
+        return node.attributes.get("value") if node is not None else None
+
+    csrf_input = BeautifulSoup(html, BS4_PARSER, parse_only=_CSRF_STRAINER).find("input")
+    return csrf_input.get("value") if csrf_input is not None else None
+
+
+def _links(html: str, css_selector: str, strainer: SoupStrainer) -> Iterator[tuple]:
+    """(href, css classes, stripped text chunks) for every matching link, in page order"""
+    if HTMLParser is not None:
+        for node in HTMLParser(html).css(css_selector):
+            href = node.attributes.get("href") or ""
+            texts = [text.strip() for text in node.text(separator="\n").split("\n") if text.strip()]
+            yield href, (node.attributes.get("class") or "").split(), texts
+        return
+
+    for link in BeautifulSoup(html, BS4_PARSER, parse_only=strainer).find_all("a"):
+        yield link.get("href", ""), link.get("class") or [], list(link.stripped_strings)
+
+
+def _build_thread(thread_id: str, classes: set, texts: list) -> InboxThread:
+    # Rows read "correspondent, [subject,] last message"; the layout is not an API, so missing parts stay None
+    return InboxThread(
+        id=thread_id,
+        url=f"https://djinni.co/my/inbox/{thread_id}/",
+        correspondent=texts[0] if texts else None,
+        subject=texts[1] if len(texts) > 2 else None,
+        preview=texts[-1] if len(texts) > 1 else None,
+        unread=any("unread" in css_class for css_class in classes),
+    )
+
+
+def iter_inbox_threads(html: str) -> Iterator[InboxThread]:
+    """Yield one InboxThread per inbox row.
+
+    A row often holds several links to the same thread (avatar, name, preview);
+    consecutive links with the same thread ID are merged into one record.
+    """
+    current_id = None
+    classes, texts = set(), []
+    for href, link_classes, link_texts in _links(html, 'a[href*="/my/inbox/"]', _THREAD_STRAINER):
+        match = THREAD_HREF.match(href)
+        if not match:
+            continue
+        thread_id = match.group(1)
+        if thread_id != current_id:
+            if current_id is not None:
+                yield _build_thread(current_id, classes, texts)
+            current_id, classes, texts = thread_id, set(), []
+        classes.update(link_classes)
+        texts.extend(text for text in link_texts if text not in texts)
+
+    if current_id is not None:
+        yield _build_thread(current_id, classes, texts)
+
+
+def iter_job_postings(html: str) -> Iterator[JobPosting]:
+    """Yield one JobPosting per job on a listing page, in page order"""
+    seen = set()
+    for href, _, link_texts in _links(html, 'a[href*="/jobs/"]', _JOB_STRAINER):
+        match = JOB_HREF.match(href)
+        if not match or match.group(1) in seen:
+            continue
+        seen.add(match.group(1))
+        path = href[len("https://djinni.co"):] if href.startswith("https://") else href
+        yield JobPosting(match.group(1), "https://djinni.co" + path, " ".join(link_texts) or None)
@@ -1,236 +1,311 @@
-import requests
+import asyncio
 import json
+from concurrent.futures import ThreadPoolExecutor
+
+from api.graphql_operations import (
+    SEEKER_RESUMES, UPDATE_SORT_DATE, update_sort_date_batch, seeker_resumes_lean,
+    is_persisted_query_not_found, is_persisted_query_not_supported
+)
+from api.robota_records import (
+    SchemaError, decode_seeker_resumes, decode_popup_payload, decode_graphql, load_document
+)
+from api.robota_socket import RobotaSocketListener
+from utils.request_utils.request_metrics import operation_context
+from utils.request_utils.transport import transport_for
+
+# All the popup path needs to know about a resume: whether it is active
+POPUP_RESUME_FIELDS = ("id", "state.state")
 
 class Robota_API:
 
-    def __init__(self, session, api_headers, logger=None):
+    def __init__(self, session, api_headers, logger=None, transport=None, persisted_queries=False):
         self.session = session
         self.api_headers = api_headers
         self.logger = logger
+        self.transport = transport or transport_for(session, logger)
+        # Send Automatic Persisted Queries (hash first, full text only when the server asks)
+        self.persisted_queries = persisted_queries
         self.resume_list = []
+        # Status code of the last resume list request, used to detect a rejected (401) token
+        self.last_status_code = None
 
-    def get_all_resume_data(self):
-        # Get extended list of resumes
+    def _post_operation(self, url, operation, variables=None, idempotent=True):
+        """POST a registered GraphQL operation using its pre-encoded body.
 
-        extended_resume_url = "https://dracula.robota.ua/?=SeekerResumes"
+        With persisted queries only the sha256 hash is sent first; on PersistedQueryNotFound
+        the full text is sent once together with the hash, which registers it on the server
+        for later requests.
+        """
+        # Label the HTTP metrics of these requests with the GraphQL operation name
+        with operation_context(operation.name):
+            return self._send_operation(url, operation, variables, idempotent)
+
+    def _send_operation(self, url, operation, variables, idempotent):
+        register = False
+        if self.persisted_queries:
+            # Some GraphQL servers answer PersistedQueryNotFound with HTTP 400, so the body decides
+            response = self.transport.request(
+                "POST", url, expected_status=(200, 400), idempotent=idempotent,
+                headers=self.api_headers, data=operation.encode(variables, persisted=True)
+            )
+            if response is None:
+                return None
+            if is_persisted_query_not_supported(response.content):
+                self.logger.info("Server does not support persisted queries, sending full queries from now on")
+                self.persisted_queries = False
+            elif is_persisted_query_not_found(response.content):
+                self.logger.debug("Persisted query %s not found, sending full query", operation.name,
+                                  extra={"operation": operation.name})
+                register = True
+            elif response.status_code != 200:
+                self.logger.error("POST request to %s failed with status code: %s", url, response.status_code,
+                                  extra={"operation": operation.name, "status": response.status_code})
+                return None
+            else:
+                return response
+
+        return self.transport.request(
+            "POST", url, expected_status=(200,), idempotent=idempotent,
+            headers=self.api_headers, data=operation.encode(variables, register=register)
+        )
 
-        # GraphQL query to fetch all resumes, matching the browser's query
-        graphql_query = """
-        query SeekerResumes {
-        seekerResumes {
-            ...SeekerResumesInfo
-            __typename
-        }
-        }
-
-        fragment SeekerResumesInfo on ProfResume {
-        similarVacanciesCount
-        personal {
-            photoUrl
-            __typename
-        }
-        city {
-            id
-            __typename
-        }
-        id
-        resumeFilling {
-            percentage
-            __typename
-        }
-        title
-        views {
-            totalCount
-            __typename
-        }
-        updateDate
-        state {
-            ...ResumeState
-            __typename
-        }
-        __typename
-        }
-
-        fragment ResumeState on ResumeState {
-        state
-        availabilityState
-        isAnonymous
-        privacySettings {
-            hasHiddenPhones
-            __typename
-        }
-        isBannedByModerator
-        hiddenCompanies {
-            name
-            __typename
-        }
-        __typename
-        }
+    def build_resume_query(self, fields=None):
+        """SeekerResumes operation for the given dotted field paths, e.g. ("id", "state.state").
+
+        None means the full browser query; any field set gets a minimal, cached document.
+        "id" and "state.state" are always selected because every Resume record needs them.
         """
+        return SEEKER_RESUMES if fields is None else seeker_resumes_lean(fields)
+
+    def get_all_resume_data(self, fields=None):
+        """Get the list of resumes, optionally fetching only `fields` (see build_resume_query)"""
+        extended_resume_url = "https://dracula.robota.ua/?=SeekerResumes"
 
-        # Prepare the request body
-        request_body = {
-            "operationName": "SeekerResumes",
-            "variables": {},
-            "query": graphql_query
-        }
+        # Send the POST request to the resume API endpoint (a read-only query, safe to retry)
+        resume_response = self._post_operation(extended_resume_url, self.build_resume_query(fields))
+        self.last_status_code = self.transport.last_status_code
+        if resume_response is None:
+            return None
 
-        # Send the POST request to the resume API endpoint
         try:
-            resume_response = self.session.post(extended_resume_url, headers=self.api_headers, json=request_body)
+            self.logger.debug("POST request to resume API successful!")
             
-            if resume_response.status_code == 200:
-                self.logger.debug("POST request to resume API successful!")
-                
-                # Parse the JSON response
-                resume_data = resume_response.json()
-                
-                # Extract the list of resumes
-                self.resume_list = resume_data.get("data", {}).get("seekerResumes", [])
-                
-                self.logger.info(f"Retrieved {len(self.resume_list)} resumes:")
-                for resume in self.resume_list:
-                    self.logger.info(f"- ID: {resume['id']}, Title: {resume['title']}, Status: {resume['state']['state']}, Update Date: {resume['updateDate']}")
-
-                return self.resume_list    
-            else:
-                self.logger.error(f"POST request to resume API failed with status code: {resume_response.status_code}")
-                self.logger.error(resume_response.text[:500])
+            # Decode the raw body straight into Resume records
+            self.resume_list = decode_seeker_resumes(resume_response.content)
+            
+            self.logger.info("Retrieved %d resumes:", len(self.resume_list))
+            for resume in self.resume_list:
+                self.logger.info("- ID: %s, Title: %s, Status: %s, Update Date: %s",
+                                 resume.id, resume.title, resume.state.state, resume.update_date,
+                                 extra={"sample": True, "resume_id": resume.id})
+
+            return self.resume_list    
 
-        except requests.exceptions.RequestException as e:
-            self.logger.error(f"An error occurred during POST request to resume API: {e}")
+        except SchemaError as e:
+            self.logger.error("SeekerResumes response does not match the expected schema: %s", e)
         except Exception as e:
-            self.logger.error(f"An unexpected error occurred: {e}")
+            self.logger.error("An unexpected error occurred: %s", e)
 
         return None
 
+    def sync_resumes(self, store, account, fields=None):
+        """Fetch SeekerResumes and apply only the differences to a ResumeStore snapshot.
+
+        Returns the {"added", "updated", "removed"} resume IDs or None if the fetch failed.
+        """
+        resume_list = self.get_all_resume_data(fields=fields)
+        if resume_list is None:
+            return None
+
+        changes = store.sync(account, resume_list)
+        self.logger.info("Resume snapshot synced for %s: %d added, %d updated, %d removed", account,
+                         len(changes["added"]), len(changes["updated"]), len(changes["removed"]))
+        return changes
+
     def get_active_resume_id_list(self):
         """Get the list of active resume IDs"""
-        return [resume["id"] for resume in self.resume_list if resume["state"]["state"] == "ACTIVE"]
+        return [resume.id for resume in self.resume_list if resume.is_active]
         
+    def _handle_popup_result(self, popup_result):
+        """Log the outcome of a PopupResult and return the popped up ID"""
+        if popup_result.errors:
+            self.logger.error("Errors occurred during the popup of resume %s:", popup_result.resume_id,
+                              extra={"resume_id": popup_result.resume_id})
+            for error in popup_result.errors:
+                self.logger.error("- %s (Type: %s)", error.get('message', 'Unknown error'), error.get('__typename'),
+                                  extra={"resume_id": popup_result.resume_id})
+            return None
+
+        if popup_result.popped_id is None:
+            self.logger.error("Popup of resume %s returned no resume data", popup_result.resume_id,
+                              extra={"resume_id": popup_result.resume_id})
+            return None
+
+        self.logger.info("Successfully popped up resume with ID: %s", popup_result.popped_id,
+                         extra={"resume_id": popup_result.popped_id})
+        return popup_result.popped_id
+
     def popup_resume(self, resume_id):
         """Popup a resume by its ID"""
         popup_url = "https://dracula.robota.ua/?=SeekerProfResumePopup"
 
-        # GraphQL mutation to popup a resume
-        graphql_mutation = """
-        mutation UpdateSeekerProfResumeSortDate($input: UpdateSeekerProfResumeSortDateInput!) {
-            updateSeekerProfResumeSortDate(input: $input) {
-                profResume {
-                    id
-                    __typename
-                }
-                errors {
-                    ... on ProfResumeDoesNotExist {
-                        message
-                        __typename
-                    }
-                    ... on ProfResumeDoesNotBelongToSeeker {
-                        message
-                        __typename
-                    }
-                    __typename
-                }
-                __typename
-            }
-        }
-        """
+        # Send the POST request to update the resume sort date.
+        # Not retried: after a read timeout the bump may already have happened, and a repeat within
+        # robota's cooldown is rejected, which would report a successful popup as failed.
+        update_response = self._post_operation(popup_url, UPDATE_SORT_DATE, {"input": {"resumeId": resume_id}},
+                                               idempotent=False)
+        if update_response is None:
+            self.logger.error("POST request to popup resume %s failed", resume_id, extra={"resume_id": resume_id})
+            return None
 
-        # Prepare the request body
-        request_body = {
-            "operationName": "UpdateSeekerProfResumeSortDate",
-            "variables": {
-                "input": {
-                    "resumeId": resume_id
-                }
-            },
-            "query": graphql_mutation
-        }
-
-        # Send the POST request to update the resume sort date
         try:
-            update_response = self.session.post(popup_url, headers=self.api_headers, json=request_body)
+            self.logger.debug("POST request to popup resume %s successful!", resume_id, extra={"resume_id": resume_id})
             
-            if update_response.status_code == 200:
-                self.logger.debug(f"POST request to popup resume {resume_id} successful!")
-                
-                # Parse the JSON response
-                update_data = update_response.json()
-                
-                # Check for errors in the response
-                errors = update_data.get("data", {}).get("updateSeekerProfResumeSortDate", {}).get("errors", [])
-                if errors:
-                    self.logger.error("Errors occurred during the popup:")
-                    for error in errors:
-                        self.logger.error(f"- {error.get('message', 'Unknown error')} (Type: {error.get('__typename')})")
-                else:
-                    updated_resume = update_data.get("data", {}).get("updateSeekerProfResumeSortDate", {}).get("profResume", {})
-                    self.logger.info(f"Successfully popped up resume with ID: {updated_resume.get('id')}")
-                    return updated_resume.get("id")
-                    
-            else:
-                self.logger.error(f"POST request to popup resume failed with status code: {update_response.status_code}")
-                self.logger.error(update_response.text[:500])
+            data = decode_graphql(update_response.content)
+            return self._handle_popup_result(
+                decode_popup_payload(resume_id, data.get("updateSeekerProfResumeSortDate"))
+            )
 
-        except requests.exceptions.RequestException as e:
-            self.logger.error(f"An error occurred during POST request to popup resume: {e}")
+        except SchemaError as e:
+            self.logger.error("Popup response for resume %s does not match the expected schema: %s", resume_id, e,
+                              extra={"resume_id": resume_id})
         except Exception as e:
-            self.logger.error(f"An unexpected error occurred: {e}")
+            self.logger.error("An unexpected error occurred: %s", e)
 
         return None
+
+    def popup_resumes_batch(self, resume_ids, batch_size=20):
+        """Popup many resumes with one GraphQL document per `batch_size` IDs.
+
+        Every ID gets its own aliased updateSeekerProfResumeSortDate field (r0, r1, ...),
+        and the aliased payloads are split back into per-ID results.
+        Returns a dict mapping every requested resume ID to the popped-up ID or None.
+        """
+        resume_ids = list(resume_ids)
+        results = {}
+        for start in range(0, len(resume_ids), max(1, batch_size)):
+            results.update(self._popup_batch(resume_ids[start:start + max(1, batch_size)]))
+        return results
+
+    def _popup_batch(self, resume_ids):
+        """Send a single aliased mutation for the given resume IDs"""
+        popup_url = "https://dracula.robota.ua/?=SeekerProfResumePopup"
+        results = {resume_id: None for resume_id in resume_ids}
+        if not resume_ids:
+            return results
+
+        aliases = {f"r{index}": resume_id for index, resume_id in enumerate(resume_ids)}
+        update_response = self._post_operation(
+            popup_url,
+            update_sort_date_batch(len(resume_ids)),
+            {f"input{index}": {"resumeId": resume_id} for index, resume_id in enumerate(resume_ids)},
+            idempotent=False,
+        )
+        if update_response is None:
+            self.logger.error("POST request to popup %d resumes failed", len(resume_ids))
+            return results
+
+        try:
+            self.logger.debug("POST request to popup %d resumes successful!", len(resume_ids))
+
+            update_data = load_document(update_response.content)
+            data = update_data.get("data") or {}
+
+            # Top-level GraphQL errors carry the alias of the failed field in their path
+            for error in update_data.get("errors") or []:
+                path = error.get("path") or []
+                if path and path[0] in aliases:
+                    self.logger.error("Popup of resume %s failed: %s", aliases[path[0]],
+                                      error.get('message', 'Unknown error'), extra={"resume_id": aliases[path[0]]})
+
+        except SchemaError as e:
+            self.logger.error("Batched popup response does not match the expected schema: %s", e)
+            return results
+        except Exception as e:
+            self.logger.error("An unexpected error occurred: %s", e)
+            return results
+
+        # Each alias on its own, so one malformed payload does not hide the resumes that were popped up
+        for alias, resume_id in aliases.items():
+            try:
+                results[resume_id] = self._handle_popup_result(decode_popup_payload(resume_id, data.get(alias)))
+            except SchemaError as e:
+                self.logger.error("Popup response for resume %s does not match the expected schema: %s", resume_id, e,
+                                  extra={"resume_id": resume_id})
+            except Exception as e:
+                self.logger.error("An unexpected error occurred: %s", e, extra={"resume_id": resume_id})
+
+        return results
+
+    async def popup_resumes_async(self, resume_ids, concurrency=5):
+        """Popup several resumes concurrently, keeping at most `concurrency` requests in flight.
+
+        Each popup runs the blocking `popup_resume` in a worker thread, so the shared
+        session (cookies, JWT headers) and the per-resume logging stay exactly the same.
+        The threads come from a pool of `concurrency` workers of its own: the loop's default
+        executor has only min(32, cpu + 4) threads and would silently cap the concurrency.
+        Returns a dict mapping every requested resume ID to the popped-up ID or None.
+        """
+        concurrency = max(1, concurrency)
+        semaphore = asyncio.Semaphore(concurrency)
+        loop = asyncio.get_running_loop()
+
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="popup") as executor:
+            async def _popup(resume_id):
+                async with semaphore:
+                    return resume_id, await loop.run_in_executor(executor, self.popup_resume, resume_id)
+
+            results = await asyncio.gather(*(_popup(resume_id) for resume_id in resume_ids))
+        return dict(results)
+
+    def popup_resumes(self, resume_ids, concurrency=5):
+        """Blocking wrapper around popup_resumes_async for plain scripts"""
+        return asyncio.run(self.popup_resumes_async(resume_ids, concurrency=concurrency))
     
     def get_socket_connection_details(self):
         """Get connection details"""
         connect_url = "https://socket-api.robota.ua/v1/connect"
         
+        connect_response = self.transport.request("GET", connect_url, expected_status=(200,), headers=self.api_headers)
+        if connect_response is None:
+            return None
+
         try:
-            connect_response = self.session.get(connect_url, headers=self.api_headers)
-            
-            if connect_response.status_code == 200:
-                self.logger.debug("GET request to connect API successful!")
-                return connect_response.json()
-            else:
-                self.logger.error(f"GET request to connect API failed with status code: {connect_response.status_code}")
-                self.logger.error(connect_response.text[:500])
+            self.logger.debug("GET request to connect API successful!")
+            return connect_response.json()
 
-        except requests.exceptions.RequestException as e:
-            self.logger.error(f"An error occurred during GET request to connect API: {e}")
         except Exception as e:
-            self.logger.error(f"An unexpected error occurred: {e}")
+            self.logger.error("An unexpected error occurred: %s", e)
 
         return None
     
+    def socket_listener(self, **kwargs):
+        """Websocket listener for push notifications, reconnecting with fresh connection details"""
+        headers = {name: value for name, value in self.api_headers.items() if name == "Authorization"}
+        return RobotaSocketListener(self.get_socket_connection_details, logger=self.logger,
+                                    headers=headers, **kwargs)
+
     def get_short_resume_data(self):
         # URL of the resume API endpoint
         resume_url = "https://ua-api.robota.ua/resume"
 
         # Send the GET request to the resume API endpoint
+        resume_response = self.transport.request("GET", resume_url, expected_status=(200,), headers=self.api_headers)
+        if resume_response is None:
+            return None
+
+        self.logger.debug("🟢 GET request to resume API successful!")
+        # Parse the JSON response
+
         try:
-            resume_response = self.session.get(resume_url, headers=self.api_headers)
-            
-            if resume_response.status_code == 200:
-                self.logger.debug("🟢 GET request to resume API successful!")
-                # Parse the JSON response
-
-                try:
-                    resume_data = resume_response.json()
-                except json.JSONDecodeError:
-                    self.logger.error("🔴 Failed to decode JSON response from resume API.")
-                    exit()     
-        
-                # Iterate over the list of resumes (if it's a list)
-                if isinstance(resume_data, list):
-                    return resume_data
-                        
-                else:
-                    self.logger.error("🔴 Unexpected response format from resume API: Expected a list.")
-                    
-            else:
-                self.logger.error(f"GET request to resume API failed with status code: {resume_response.status_code}")
-                self.logger.error(resume_response.text[:500])
+            resume_data = resume_response.json()
+        except json.JSONDecodeError:
+            self.logger.error("🔴 Failed to decode JSON response from resume API.")
+            exit()     
 
-        except requests.exceptions.RequestException as e:
-            self.logger.error(f"An error occurred during GET request to resume API: {e}")
-        except Exception as e:
-            self.logger.error(f"An unexpected error occurred: {e}")
+        # Iterate over the list of resumes (if it's a list)
+        if isinstance(resume_data, list):
+            return resume_data
+
+        self.logger.error("🔴 Unexpected response format from resume API: Expected a list.")
         return None
@@ -0,0 +1,156 @@
+"""Compact records decoded from dracula.robota.ua GraphQL responses.
+
+Responses are decoded with orjson when it is installed (stdlib json otherwise)
+straight from the raw body bytes, and turned into __slots__ records. Every
+schema check lives here, so a changed API fails with one SchemaError instead of
+KeyErrors scattered over the callers.
+"""
+import json
+from typing import List, Optional
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+
+class SchemaError(ValueError):
+    """GraphQL response does not have the shape we rely on"""
+
+
+class ResumeState:
+    __slots__ = ("state", "availability_state", "is_anonymous", "is_banned_by_moderator")
+
+    def __init__(self, state, availability_state=None, is_anonymous=None, is_banned_by_moderator=None):
+        self.state = state
+        self.availability_state = availability_state
+        self.is_anonymous = is_anonymous
+        self.is_banned_by_moderator = is_banned_by_moderator
+
+    def to_dict(self) -> dict:
+        return {
+            "state": self.state,
+            "availabilityState": self.availability_state,
+            "isAnonymous": self.is_anonymous,
+            "isBannedByModerator": self.is_banned_by_moderator,
+        }
+
+
+class Resume:
+    __slots__ = ("id", "title", "update_date", "state", "views", "city_id", "filling_percentage")
+
+    def __init__(self, id, state, title=None, update_date=None, views=None, city_id=None, filling_percentage=None):
+        self.id = id
+        self.state = state
+        self.title = title
+        self.update_date = update_date
+        self.views = views
+        self.city_id = city_id
+        self.filling_percentage = filling_percentage
+
+    @property
+    def is_active(self) -> bool:
+        return self.state.state == "ACTIVE"
+
+    def to_dict(self) -> dict:
+        """GraphQL-shaped dict, e.g. for storing the record as JSON"""
+        return {
+            "id": self.id,
+            "title": self.title,
+            "updateDate": self.update_date,
+            "state": self.state.to_dict(),
+            "views": {"totalCount": self.views},
+            "city": {"id": self.city_id},
+            "resumeFilling": {"percentage": self.filling_percentage},
+        }
+
+    def __repr__(self) -> str:
+        return f"Resume(id={self.id!r}, state={self.state.state!r})"
+
+
+class PopupResult:
+    __slots__ = ("resume_id", "popped_id", "errors")
+
+    def __init__(self, resume_id, popped_id=None, errors=()):
+        self.resume_id = resume_id
+        self.popped_id = popped_id
+        self.errors = errors
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors and self.popped_id is not None
+
+
+def _nested(data: dict, key: str, field: str):
+    value = data.get(key)
+    if value is None:
+        return None
+    if not isinstance(value, dict):
+        raise SchemaError(f"Resume field '{key}' should be an object, got {type(value).__name__}")
+    return value.get(field)
+
+
+def load_document(body) -> dict:
+    """Decode a GraphQL response body (bytes or str) into the full {data, errors} document"""
+    try:
+        document = _loads(body)
+    except ValueError as e:
+        raise SchemaError(f"Response is not valid JSON: {e}")
+    if not isinstance(document, dict):
+        raise SchemaError("GraphQL response is not an object")
+    return document
+
+
+def decode_graphql(body) -> dict:
+    """Decode a GraphQL response body and return its `data` object"""
+    document = load_document(body)
+    data = document.get("data")
+    if data is None:
+        errors = document.get("errors") or []
+        messages = "; ".join(str(error.get("message", error)) for error in errors) or "no data"
+        raise SchemaError(f"GraphQL response carries no data: {messages}")
+    return data
+
+
+def decode_resume(resume: dict) -> Resume:
+    if not isinstance(resume, dict) or "id" not in resume:
+        raise SchemaError(f"Resume without id: {str(resume)[:200]}")
+    state = resume.get("state")
+    if not isinstance(state, dict) or not isinstance(state.get("state"), str):
+        raise SchemaError(f"Resume {resume['id']} has no state.state")
+
+    return Resume(
+        id=resume["id"],
+        state=ResumeState(
+            state["state"],
+            state.get("availabilityState"),
+            state.get("isAnonymous"),
+            state.get("isBannedByModerator"),
+        ),
+        title=resume.get("title"),
+        update_date=resume.get("updateDate"),
+        views=_nested(resume, "views", "totalCount"),
+        city_id=_nested(resume, "city", "id"),
+        filling_percentage=_nested(resume, "resumeFilling", "percentage"),
+    )
+
+
+def decode_seeker_resumes(body) -> List[Resume]:
+    """Decode a SeekerResumes response into Resume records"""
+    resumes = decode_graphql(body).get("seekerResumes")
+    if not isinstance(resumes, list):
+        raise SchemaError("data.seekerResumes should be a list")
+    return [decode_resume(resume) for resume in resumes]
+
+
+def decode_popup_payload(resume_id, payload: Optional[dict]) -> PopupResult:
+    """Turn one updateSeekerProfResumeSortDate payload into a PopupResult"""
+    if payload is None:
+        return PopupResult(resume_id, errors=({"message": "No popup result returned", "__typename": None},))
+    if not isinstance(payload, dict):
+        raise SchemaError("updateSeekerProfResumeSortDate payload should be an object")
+
+    errors = tuple(payload.get("errors") or ())
+    prof_resume = payload.get("profResume") or {}
+    return PopupResult(resume_id, popped_id=prof_resume.get("id"), errors=errors)
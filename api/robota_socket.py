@@ -0,0 +1,218 @@
+"""Push notifications from socket-api.robota.ua.
+
+`RobotaSocketListener` keeps one websocket open using the details returned by
+`Robota_API.get_socket_connection_details`. It reconnects with jittered exponential
+backoff and hands every message to a callback and/or an asyncio.Queue (filled only
+when there is no callback or `events()` is being consumed). The
+`websockets` package is optional and only imported when the listener connects.
+
+The connect endpoint is not documented, so the websocket URL is taken from the
+first of the usual keys that is present (see `socket_url_from_details`). Tests can
+point the listener at a local websocket server with
+`RobotaSocketListener(lambda: {"url": "ws://127.0.0.1:8765"})`.
+"""
+import asyncio
+import inspect
+import json
+import logging
+import random
+import time
+from typing import Callable, Optional
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+from api.robota_records import _loads
+
+
+URL_KEYS = ("url", "socketUrl", "wsUrl", "endpoint", "uri", "host")
+TOKEN_KEYS = ("token", "accessToken", "connectionToken")
+
+
+class SocketEvent:
+    __slots__ = ("type", "data", "received_at")
+
+    def __init__(self, type, data, received_at):
+        self.type = type
+        self.data = data
+        self.received_at = received_at
+
+    def __repr__(self) -> str:
+        return f"SocketEvent(type={self.type!r})"
+
+
+def socket_url_from_details(details) -> Optional[str]:
+    """Build the websocket URL from the connect response, adding the token if the URL lacks it"""
+    if isinstance(details, str):
+        details = {"url": details}
+    if not isinstance(details, dict):
+        return None
+    if isinstance(details.get("data"), dict):
+        details = details["data"]
+
+    url = next((details[key] for key in URL_KEYS if isinstance(details.get(key), str)), None)
+    if not url:
+        return None
+    if "://" not in url:
+        url = "wss://" + url
+
+    parsed = urlparse(url)
+    scheme = {"https": "wss", "http": "ws"}.get(parsed.scheme, parsed.scheme)
+    query = dict(parse_qsl(parsed.query))
+    token = next((details[key] for key in TOKEN_KEYS if details.get(key)), None)
+    if token and not any(key in query for key in TOKEN_KEYS):
+        query["token"] = token
+    return urlunparse(parsed._replace(scheme=scheme, query=urlencode(query)))
+
+
+def decode_event(message) -> SocketEvent:
+    """JSON messages become their decoded object, anything else is kept as is"""
+    received_at = time.time()
+    try:
+        data = _loads(message)
+    except (TypeError, ValueError):
+        return SocketEvent("raw", message, received_at)
+    event_type = "message"
+    if isinstance(data, dict):
+        event_type = data.get("type") or data.get("event") or event_type
+    return SocketEvent(event_type, data, received_at)
+
+
+class RobotaSocketListener:
+    """Long-lived websocket listener with reconnect/backoff and callback + queue delivery.
+
+    `connection_details` is called (in a worker thread) before every connection
+    attempt, so expired socket tokens are refreshed on reconnect. Returning None
+    counts as a failed attempt.
+    """
+
+    def __init__(
+        self,
+        connection_details: Callable[[], Optional[dict]],
+        logger=None,
+        on_event: Optional[Callable] = None,
+        headers: Optional[dict] = None,
+        queue_size: int = 1000,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+        max_retries: Optional[int] = None,
+        ping_interval: float = 20.0,
+        open_timeout: float = 10.0,
+    ):
+        self.connection_details = connection_details
+        self.logger = logger or logging.getLogger(__name__)
+        self.on_event = on_event
+        self.headers = headers
+        self.queue_size = queue_size
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_retries = max_retries
+        self.ping_interval = ping_interval
+        self.open_timeout = open_timeout
+        self.queue: Optional[asyncio.Queue] = None
+        self.connections = 0
+        self.events_received = 0
+        # Set by events(); with a callback and nobody reading, the queue would only fill up
+        self._queue_consumed = False
+        self._stopping: Optional[asyncio.Event] = None
+        self._websocket = None
+
+    def _ensure_started(self) -> None:
+        # Created lazily so they belong to the running event loop
+        if self.queue is None:
+            self.queue = asyncio.Queue(maxsize=self.queue_size)
+            self._stopping = asyncio.Event()
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _connect(self, url: str):
+        try:
+            import websockets
+        except ImportError:
+            raise ImportError("The socket listener needs the websockets package: pip install websockets")
+
+        kwargs = {"ping_interval": self.ping_interval, "open_timeout": self.open_timeout}
+        if self.headers:
+            # The keyword was renamed in websockets 14
+            parameters = inspect.signature(websockets.connect).parameters
+            kwargs["additional_headers" if "additional_headers" in parameters else "extra_headers"] = self.headers
+        return websockets.connect(url, **kwargs)
+
+    async def _deliver(self, event: SocketEvent) -> None:
+        if self.on_event is None or self._queue_consumed:
+            if self.queue.full():
+                # Keep the newest events, a slow consumer should not stall the socket
+                self.queue.get_nowait()
+                self.logger.warning("Socket event queue is full, dropping the oldest event")
+            self.queue.put_nowait(event)
+
+        if self.on_event is not None:
+            try:
+                result = self.on_event(event)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                self.logger.error(f"Socket event callback failed: {e}")
+
+    async def _listen_once(self) -> bool:
+        """Connect and read until the socket closes; return True if any event arrived"""
+        details = await asyncio.to_thread(self.connection_details)
+        url = socket_url_from_details(details)
+        if url is None:
+            self.logger.error(f"No websocket URL in socket connection details: {json.dumps(details)[:200]}")
+            return False
+
+        received = False
+        async with self._connect(url) as websocket:
+            self._websocket = websocket
+            self.connections += 1
+            self.logger.info(f"Socket connected to {urlparse(url).netloc}")
+            try:
+                async for message in websocket:
+                    received = True
+                    self.events_received += 1
+                    await self._deliver(decode_event(message))
+            finally:
+                self._websocket = None
+        return received
+
+    async def run(self) -> None:
+        """Listen until stop() is called or max_retries consecutive attempts failed"""
+        self._ensure_started()
+        attempt = 0
+
+        while not self._stopping.is_set():
+            try:
+                if await self._listen_once():
+                    attempt = 0
+                if not self._stopping.is_set():
+                    self.logger.warning("Socket connection closed")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Socket connection failed: {e}")
+            if self._stopping.is_set():
+                break
+
+            if self.max_retries is not None and attempt >= self.max_retries:
+                self.logger.error(f"Giving up on the socket after {attempt} reconnect attempts")
+                break
+            delay = self._backoff(attempt)
+            attempt += 1
+            self.logger.info(f"Reconnecting socket in {delay:.1f}s (attempt {attempt})")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def stop(self) -> None:
+        if self._stopping is not None:
+            self._stopping.set()
+        if self._websocket is not None:
+            await self._websocket.close()
+
+    async def events(self):
+        """Async iterator over received events, for consumers that prefer the queue to a callback"""
+        self._ensure_started()
+        self._queue_consumed = True
+        while True:
+            yield await self.queue.get()
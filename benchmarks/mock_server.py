@@ -0,0 +1,416 @@
+"""Local stand-in for the robota.ua and djinni.co endpoints the clients use.
+
+One threaded HTTP server answers for every host; the Host header picks the site.
+MockRouteAdapter sends the traffic of a normal HostAdapter session to it, so
+Auth, Robota_API and Jinny_API run unchanged against their real URLs:
+
+    robota.ua              GET  /auth/login            touch, sets a session cookie
+    auth-api.robota.ua     POST /Login                 jwt-token cookie and {"token": ...}
+    dracula.robota.ua      POST /                      SeekerResumes*, UpdateSeekerProfResumeSortDate(Batch*), APQ
+    socket-api.robota.ua   GET  /v1/connect            websocket connection details
+    djinni.co              GET  /, GET/POST /login, GET /my/profile/, GET /my/inbox/?page=N,
+                           POST /ajax/reactivate/
+
+Every request waits `latency` (+ up to `jitter`) seconds, then fails with a 429
+(with Retry-After) with probability `throttle_rate` or a 503 with probability
+`error_rate`, before it is routed. Faults can be paused, e.g. while the benchmark
+logs in the accounts it needs.
+"""
+import base64
+import contextlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from utils.request_utils.host_adapter import HostAdapter
+
+# Top-level Resume fields the mock only returns when the query selects them ("id" always)
+_RESUME_FIELDS = ("title", "updateDate", "state", "views", "city", "resumeFilling")
+
+
+class MockConfig:
+    """Behaviour of the mock server: fault injection and the size of the fake data"""
+
+    def __init__(self, latency: float = 0.02, jitter: float = 0.0, error_rate: float = 0.0,
+                 throttle_rate: float = 0.0, retry_after: float = 0.1, resumes: int = 5,
+                 inbox_pages: int = 3, threads_per_page: int = 20, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.resumes = resumes
+        self.inbox_pages = inbox_pages
+        self.threads_per_page = threads_per_page
+        self.seed = seed
+
+
+def fake_jwt(lifetime: int = 3600) -> str:
+    """Unsigned JWT whose `exp` claim is `lifetime` seconds from now, enough for is_jwt_valid"""
+    def encode(part: dict) -> str:
+        return base64.urlsafe_b64encode(json.dumps(part).encode("utf-8")).rstrip(b"=").decode("ascii")
+
+    return f"{encode({'alg': 'none', 'typ': 'JWT'})}.{encode({'exp': int(time.time()) + lifetime})}.mock"
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so the client pools behave as against the real hosts
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; with Nagle on, delayed ACKs add ~40ms to every response
+    disable_nagle_algorithm = True
+    server: "_MockHTTPServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    # --- plumbing ---
+
+    def _dispatch(self, method: str) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        self.body = self.rfile.read(length) if length else b""
+        self.host = (self.headers.get("Host") or "").split(":")[0]
+        url = urlsplit(self.path)
+        self.query = parse_qs(url.query)
+        self.cookies = {name: morsel.value for name, morsel in SimpleCookie(self.headers.get("Cookie") or "").items()}
+
+        mock = self.server.mock
+        time.sleep(mock.delay())
+        fault = mock.fault()
+        if fault == 429:
+            self._send(429, b'{"message":"Too Many Requests"}',
+                       headers={"Retry-After": str(mock.config.retry_after)})
+        elif fault == 503:
+            self._send(503, b'{"message":"Service Unavailable"}')
+        else:
+            route = mock.routes.get((self.host, method, url.path))
+            if route is None:
+                self._send(404, b"Not Found", content_type="text/plain")
+            else:
+                route(self)
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/json",
+              headers: dict = None, cookies: dict = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        for name, value in (cookies or {}).items():
+            self.send_header("Set-Cookie", f"{name}={value}; Path=/")
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.mock.count(self.host, urlsplit(self.path).path, status)
+
+    def _send_json(self, payload, status: int = 200, **kwargs) -> None:
+        self._send(status, json.dumps(payload, separators=(",", ":")).encode("utf-8"), **kwargs)
+
+    def _send_html(self, html: str, status: int = 200, **kwargs) -> None:
+        self._send(status, html.encode("utf-8"), content_type="text/html; charset=utf-8", **kwargs)
+
+    def _redirect(self, location: str, **kwargs) -> None:
+        self._send(302, b"", content_type="text/plain", headers={"Location": location}, **kwargs)
+
+    # --- robota.ua ---
+
+    def robota_touch(self):
+        self._send_html("<html><body>robota.ua</body></html>", cookies={"visitor": uuid.uuid4().hex})
+
+    def robota_login(self):
+        try:
+            credentials = json.loads(self.body)
+        except ValueError:
+            credentials = {}
+        if not credentials.get("username") or not credentials.get("password"):
+            self._send_json({"message": "Invalid credentials"}, status=400)
+            return
+        token = fake_jwt()
+        self._send_json({"token": token}, cookies={"jwt-token": token})
+
+    def dracula(self):
+        if not (self.headers.get("Authorization") or "").startswith("Bearer "):
+            self._send_json({"errors": [{"message": "Unauthorized"}]}, status=401)
+            return
+        try:
+            document = json.loads(self.body)
+        except ValueError:
+            self._send_json({"errors": [{"message": "Body is not JSON"}]}, status=400)
+            return
+
+        query = self.server.mock.resolve_query(document)
+        if query is None:
+            self._send_json({"errors": [{"message": "PersistedQueryNotFound",
+                                         "extensions": {"code": "PERSISTED_QUERY_NOT_FOUND"}}]})
+            return
+
+        name = document.get("operationName") or ""
+        variables = document.get("variables") or {}
+        if name.startswith("SeekerResumes"):
+            self._send_json({"data": {"seekerResumes": self.server.mock.resumes(query)}})
+        elif name.startswith("UpdateSeekerProfResumeSortDate"):
+            data = {}
+            for key, value in variables.items():
+                # "input" for the single mutation, "input0", "input1", ... for the aliased batch
+                alias = "updateSeekerProfResumeSortDate" if key == "input" else f"r{key[len('input'):]}"
+                data[alias] = {"profResume": {"id": value.get("resumeId")}, "errors": []}
+            self._send_json({"data": data})
+        else:
+            self._send_json({"errors": [{"message": f"Unknown operation {name!r}"}]}, status=400)
+
+    def socket_connect(self):
+        self._send_json({"url": "https://socket-api.robota.ua/ws", "token": uuid.uuid4().hex})
+
+    # --- djinni.co ---
+
+    def _csrf_cookie(self) -> dict:
+        return {} if self.cookies.get("csrftoken") else {"csrftoken": uuid.uuid4().hex}
+
+    def _logged_in(self) -> bool:
+        return self.server.mock.has_session(self.cookies.get("sessionid"))
+
+    def djinni_touch(self):
+        self._send_html("<html><body>djinni.co</body></html>", cookies=self._csrf_cookie())
+
+    def djinni_login_page(self):
+        cookies = self._csrf_cookie()
+        token = cookies.get("csrftoken") or self.cookies["csrftoken"]
+        self._send_html(
+            '<html><body><form method="post" action="/login">'
+            f'<input type="hidden" name="csrfmiddlewaretoken" value="{token}">'
+            '<input name="email"><input name="password" type="password">'
+            "</form></body></html>",
+            cookies=cookies,
+        )
+
+    def djinni_login(self):
+        form = parse_qs(self.body.decode("utf-8"))
+        if not form.get("csrfmiddlewaretoken") or not form.get("email") or not form.get("password"):
+            self._send_html("<html><body>CSRF verification failed</body></html>", status=403)
+            return
+        # Django rotates the CSRF token on login
+        self._redirect("https://djinni.co/my/profile/", cookies={
+            "sessionid": self.server.mock.new_session(),
+            "csrftoken": uuid.uuid4().hex,
+        })
+
+    def djinni_profile(self):
+        if not self._logged_in():
+            self._redirect("https://djinni.co/login?from=frontpage_main")
+            return
+        self._send_html("<html><body>Profile</body></html>")
+
+    def djinni_inbox(self):
+        if not self._logged_in():
+            self._redirect("https://djinni.co/login?from=frontpage_main")
+            return
+        try:
+            page = int(self.query.get("page", ["1"])[0])
+        except ValueError:
+            page = 1
+        config = self.server.mock.config
+        if not 1 <= page <= config.inbox_pages:
+            self._send_html("<html><body>Not Found</body></html>", status=404)
+            return
+
+        rows = []
+        first_id = 100000 + config.inbox_pages * config.threads_per_page - (page - 1) * config.threads_per_page
+        for thread_id in range(first_id, first_id - config.threads_per_page, -1):
+            css_class = "inbox-thread unread" if thread_id % 3 == 0 else "inbox-thread"
+            rows.append(
+                f'<li><a class="{css_class}" href="/my/inbox/{thread_id}/">'
+                f"<strong>Recruiter {thread_id}</strong><span>Vacancy {thread_id}</span>"
+                f"<p>Hello, are you open to new opportunities?</p></a></li>"
+            )
+        self._send_html(f"<html><body><ul>{''.join(rows)}</ul></body></html>")
+
+    def djinni_reactivate(self):
+        if not self._logged_in():
+            self._redirect("https://djinni.co/login?from=frontpage_main")
+            return
+        token = self.headers.get("X-CSRFToken")
+        if not token or token != self.cookies.get("csrftoken"):
+            self._send_html("<html><body>CSRF verification failed</body></html>", status=403)
+            return
+        self._send_json({"status": "ok"})
+
+
+class _MockHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    mock: "MockServer"
+
+
+class MockServer:
+    """Threaded mock of robota.ua and djinni.co on a free local port; also a context manager"""
+
+    ROUTES = {
+        ("robota.ua", "GET", "/auth/login"): _MockHandler.robota_touch,
+        ("auth-api.robota.ua", "POST", "/Login"): _MockHandler.robota_login,
+        ("dracula.robota.ua", "POST", "/"): _MockHandler.dracula,
+        ("socket-api.robota.ua", "GET", "/v1/connect"): _MockHandler.socket_connect,
+        ("djinni.co", "GET", "/"): _MockHandler.djinni_touch,
+        ("djinni.co", "GET", "/login"): _MockHandler.djinni_login_page,
+        ("djinni.co", "POST", "/login"): _MockHandler.djinni_login,
+        ("djinni.co", "GET", "/my/profile/"): _MockHandler.djinni_profile,
+        ("djinni.co", "GET", "/my/inbox/"): _MockHandler.djinni_inbox,
+        ("djinni.co", "POST", "/ajax/reactivate/"): _MockHandler.djinni_reactivate,
+    }
+
+    def __init__(self, config: MockConfig = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or MockConfig()
+        self.routes = self.ROUTES
+        self._random = random.Random(self.config.seed)
+        self._queries = {}
+        self._sessions = set()
+        self._faults_paused = False
+        self._counts = defaultdict(int)
+        self._persisted_misses = 0
+        self._lock = threading.Lock()
+        self._server = _MockHTTPServer((host, port), _MockHandler)
+        self._server.mock = self
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "MockServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    # --- state shared by the handler threads ---
+
+    def delay(self) -> float:
+        with self._lock:
+            return self.config.latency + (self._random.uniform(0, self.config.jitter) if self.config.jitter else 0.0)
+
+    @contextlib.contextmanager
+    def faults_paused(self):
+        """Answer every request inside the block normally"""
+        with self._lock:
+            self._faults_paused = True
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._faults_paused = False
+
+    def fault(self):
+        """429, 503 or None for the next request"""
+        with self._lock:
+            if self._faults_paused:
+                return None
+            roll = self._random.random()
+        if roll < self.config.throttle_rate:
+            return 429
+        if roll < self.config.throttle_rate + self.config.error_rate:
+            return 503
+        return None
+
+    def count(self, host: str, path: str, status: int) -> None:
+        with self._lock:
+            self._counts[(host, path, status)] += 1
+
+    def counts(self, reset: bool = False) -> dict:
+        """{(host, path, status): requests} answered so far"""
+        with self._lock:
+            counts = dict(self._counts)
+            if reset:
+                self._counts.clear()
+                self._persisted_misses = 0
+        return counts
+
+    def persisted_query_misses(self) -> int:
+        """APQ hashes answered with PersistedQueryNotFound since the last counts(reset=True)"""
+        with self._lock:
+            return self._persisted_misses
+
+    def new_session(self) -> str:
+        session_id = uuid.uuid4().hex
+        with self._lock:
+            self._sessions.add(session_id)
+        return session_id
+
+    def has_session(self, session_id) -> bool:
+        with self._lock:
+            return session_id in self._sessions
+
+    def resolve_query(self, document: dict):
+        """Query text of a GraphQL request, or None for an unknown APQ hash.
+
+        Like a real APQ server, a hash is only stored when the request carries both the
+        full text and the persistedQuery extension; a plain full-text query stores nothing.
+        """
+        query = document.get("query")
+        persisted = ((document.get("extensions") or {}).get("persistedQuery") or {}).get("sha256Hash")
+        with self._lock:
+            if query:
+                if persisted:
+                    self._queries[persisted] = query
+                return query
+            query = self._queries.get(persisted)
+            if query is None:
+                self._persisted_misses += 1
+            return query
+
+    def resumes(self, query: str) -> list:
+        """Fake resumes with only the top-level fields named in the query, like a real lean selection"""
+        selected = {field for field in _RESUME_FIELDS if re.search(rf"\b{field}\b", query)}
+        resumes = []
+        for index in range(self.config.resumes):
+            resume = {
+                "id": str(1000 + index),
+                "title": f"Python developer {index}",
+                "updateDate": "2024-01-01T00:00:00",
+                "state": {"state": "ACTIVE", "availabilityState": "OPEN", "isAnonymous": False,
+                          "isBannedByModerator": False},
+                "views": {"totalCount": index * 7},
+                "city": {"id": 1},
+                "resumeFilling": {"percentage": 90},
+            }
+            resumes.append({key: value for key, value in resume.items() if key == "id" or key in selected})
+        return resumes
+
+
+class MockRouteAdapter(HostAdapter):
+    """HostAdapter that connects to the mock server whatever host a request is for.
+
+    The request URL stays untouched: cookies, per-host rate limits, concurrency
+    control and metrics all keep the real host name, which travels in the Host header.
+    """
+
+    def __init__(self, target_url: str, **kwargs):
+        self.target_url = target_url
+        super().__init__(**kwargs)
+
+    def get_connection_with_tls_context(self, request, verify, proxies=None, cert=None):
+        request.headers["Host"] = urlsplit(request.url).netloc
+        return self.poolmanager.connection_from_url(self.target_url)
+
+    def request_url(self, request, proxies):
+        return request.path_url
@@ -0,0 +1,247 @@
+"""Offline throughput/latency benchmarks of the Auth, Robota_API and Jinny_API flows.
+
+Every scenario runs its flow `--iterations` times at each `--concurrency` level
+against a local MockServer; no real account or network access is needed.
+
+Usage (from the repository root):
+    python -m benchmarks.run_benchmarks
+    python -m benchmarks.run_benchmarks --scenarios robota_popup,robota_popup_batch --concurrency 1,8,32
+    python -m benchmarks.run_benchmarks --latency 0.05 --jitter 0.02 --throttle-rate 0.05 --output bench.json
+    python -m benchmarks.run_benchmarks --scenarios robota_resumes,robota_popup --persisted-queries
+
+The adapter runs without the rate limiter and adaptive concurrency controller, so
+results depend on the client code only; `--limits` builds them from the environment
+(HTTP_RATE_LIMIT, HTTP_ADAPTIVE_CONCURRENCY, ...) to benchmark those as well.
+"""
+import argparse
+import json
+import logging
+import math
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+from api.auth import Auth
+from api.jinni_api import Jinny_API
+from api.robota_api import Robota_API, POPUP_RESUME_FIELDS
+from api.robota_api_headers import api_headers
+from benchmarks.mock_server import MockConfig, MockRouteAdapter, MockServer
+from utils.request_utils.adaptive_concurrency import concurrency_controller_from_env
+from utils.request_utils.connection_pool import build_session
+from utils.request_utils.rate_limiter import rate_limiter_from_env
+from utils.request_utils.request_metrics import RequestMetrics
+
+
+class Scenario:
+    """A flow to benchmark: `setup(bench)` runs once per concurrency level and returns
+    the state handed to `run(state, iteration)`, which returns True on success"""
+
+    def __init__(self, name: str, setup: Callable, run: Callable[..., bool]):
+        self.name = name
+        self.setup = setup
+        self.run = run
+
+
+class Bench:
+    """Shared adapter and factories for logged-in clients"""
+
+    def __init__(self, adapter, logger, resumes: int, persisted_queries: bool = False):
+        self.adapter = adapter
+        self.logger = logger
+        self.persisted_queries = persisted_queries
+        self.resume_ids = [str(1000 + index) for index in range(resumes)]
+
+    def session(self):
+        # Sessions share the adapter (pools, metrics) and keep their own cookies, like fleet accounts
+        return build_session(adapter=self.adapter)
+
+    def robota(self) -> Robota_API:
+        session, headers = self.session(), dict(api_headers)
+        if not Auth(session, headers, "bench@example.com", "secret", logger=self.logger).login():
+            raise RuntimeError("Mock robota.ua login failed")
+        return Robota_API(session=session, api_headers=headers, logger=self.logger,
+                          persisted_queries=self.persisted_queries)
+
+    def jinny(self) -> Jinny_API:
+        djinny = Jinny_API("bench@example.com", "secret", logger=self.logger, session=self.session())
+        if not djinny.login():
+            raise RuntimeError("Mock djinni.co login failed")
+        return djinny
+
+
+def _robota_login(bench: Bench, iteration: int) -> bool:
+    return bool(Auth(bench.session(), dict(api_headers), f"bench{iteration}@example.com", "secret",
+                     logger=bench.logger).login())
+
+
+def _jinny_login(bench: Bench, iteration: int) -> bool:
+    return Jinny_API(f"bench{iteration}@example.com", "secret", logger=bench.logger,
+                     session=bench.session()).login()
+
+
+def _jinny_inbox(djinny: Jinny_API, iteration: int) -> bool:
+    threads = djinny.iter_inbox_threads()
+    return threads is not None and bool(list(threads))
+
+
+SCENARIOS = {scenario.name: scenario for scenario in (
+    Scenario("auth_login", lambda bench: bench, _robota_login),
+    Scenario("robota_resumes", lambda bench: bench.robota(),
+             lambda robota, iteration: robota.get_all_resume_data() is not None),
+    Scenario("robota_resumes_lean", lambda bench: bench.robota(),
+             lambda robota, iteration: robota.get_all_resume_data(fields=POPUP_RESUME_FIELDS) is not None),
+    Scenario("robota_popup", lambda bench: (bench.robota(), bench.resume_ids),
+             lambda state, iteration: state[0].popup_resume(state[1][iteration % len(state[1])]) is not None),
+    Scenario("robota_popup_batch", lambda bench: (bench.robota(), bench.resume_ids),
+             lambda state, iteration: all(state[0].popup_resumes_batch(state[1]).values())),
+    Scenario("robota_socket_connect", lambda bench: bench.robota(),
+             lambda robota, iteration: robota.get_socket_connection_details() is not None),
+    Scenario("jinny_login", lambda bench: bench, _jinny_login),
+    Scenario("jinny_inbox", lambda bench: bench.jinny(), _jinny_inbox),
+    Scenario("jinny_reactivate", lambda bench: bench.jinny(), lambda djinny, iteration: djinny.reactivate()),
+)}
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def run_scenario(scenario: Scenario, bench: Bench, server: MockServer, concurrency: int, iterations: int) -> dict:
+    """Run `iterations` flows with `concurrency` threads; latencies are per flow, in seconds"""
+    # Setup logins are not measured; an injected fault there would only abort the scenario
+    with server.faults_paused():
+        state = scenario.setup(bench)
+    server.counts(reset=True)
+    latencies = []
+    failures = 0
+    lock = threading.Lock()
+
+    def timed(iteration):
+        nonlocal failures
+        started = time.perf_counter()
+        try:
+            ok = scenario.run(state, iteration)
+        except Exception as e:
+            bench.logger.error(f"{scenario.name} iteration {iteration} raised: {e}")
+            ok = False
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            failures += not ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(timed, range(iterations)))
+    wall_time = time.perf_counter() - started
+
+    statuses = {}
+    for (_, _, status), count in server.counts().items():
+        statuses[str(status)] = statuses.get(str(status), 0) + count
+    latencies.sort()
+    return {
+        "scenario": scenario.name,
+        "concurrency": concurrency,
+        "iterations": iterations,
+        "failures": failures,
+        "seconds": round(wall_time, 3),
+        "flows_per_s": round(iterations / wall_time, 2) if wall_time else None,
+        "requests": sum(statuses.values()),
+        "statuses": statuses,
+        # Extra round trips spent on PersistedQueryNotFound (--persisted-queries only)
+        "apq_misses": server.persisted_query_misses(),
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 1),
+        "max_ms": round(latencies[-1] * 1000, 1),
+    }
+
+
+def _print_table(results: List[Dict]) -> None:
+    header = (f"{'scenario':<24}{'conc':>5}{'flows/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+              f"{'max ms':>9}{'fail':>6}{'reqs':>7}{'429':>6}{'503':>6}{'apq miss':>10}")
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        statuses = result["statuses"]
+        print(f"{result['scenario']:<24}{result['concurrency']:>5}{result['flows_per_s']:>10}"
+              f"{result['p50_ms']:>9}{result['p95_ms']:>9}{result['p99_ms']:>9}{result['max_ms']:>9}"
+              f"{result['failures']:>6}{result['requests']:>7}{statuses.get('429', 0):>6}{statuses.get('503', 0):>6}"
+              f"{result['apq_misses']:>10}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the API client flows against a local mock server")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"comma-separated scenarios (default: all of {', '.join(SCENARIOS)})")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated thread counts (default: 1,4,16)")
+    parser.add_argument("--iterations", type=int, default=50, help="flows per scenario and concurrency level")
+    parser.add_argument("--latency", type=float, default=0.02, help="server latency per request in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency, up to this many seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=0.1, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--resumes", type=int, default=5, help="resumes per mock account")
+    parser.add_argument("--inbox-pages", type=int, default=3)
+    parser.add_argument("--threads-per-page", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1, help="fault injection seed, for reproducible runs")
+    parser.add_argument("--persisted-queries", action="store_true",
+                        help="send robota.ua GraphQL operations as Automatic Persisted Queries")
+    parser.add_argument("--limits", action="store_true",
+                        help="use the rate limiter and adaptive concurrency configured in the environment")
+    parser.add_argument("--log-level", default="CRITICAL", help="client log level (default: CRITICAL)")
+    parser.add_argument("--output", help="also write the results and per-request HTTP metrics as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    unknown = [name for name in args.scenarios.split(",") if name not in SCENARIOS]
+    if unknown:
+        print(f"Unknown scenarios: {', '.join(unknown)}", file=sys.stderr)
+        return 2
+
+    logger = logging.getLogger("benchmark")
+    logger.setLevel(args.log_level.upper())
+    logger.addHandler(logging.StreamHandler())
+    logger.propagate = False
+
+    config = MockConfig(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                        throttle_rate=args.throttle_rate, retry_after=args.retry_after, resumes=args.resumes,
+                        inbox_pages=args.inbox_pages, threads_per_page=args.threads_per_page, seed=args.seed)
+    levels = [int(level) for level in args.concurrency.split(",")]
+    results = []
+    metrics = RequestMetrics()
+
+    with MockServer(config) as server:
+        adapter = MockRouteAdapter(
+            server.url,
+            pool_maxsize=max(levels),
+            rate_limiter=rate_limiter_from_env(logger) if args.limits else None,
+            concurrency_controller=concurrency_controller_from_env(logger) if args.limits else None,
+            metrics=metrics,
+        )
+        bench = Bench(adapter, logger, args.resumes, persisted_queries=args.persisted_queries)
+        for name in args.scenarios.split(","):
+            for concurrency in levels:
+                try:
+                    results.append(run_scenario(SCENARIOS[name], bench, server, concurrency, args.iterations))
+                except Exception as e:
+                    # Keep the results gathered so far and go on with the next scenario
+                    print(f"{name} at concurrency {concurrency} aborted: {e}", file=sys.stderr)
+        adapter.close()
+
+    _print_table(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump({"config": vars(args), "results": results, "http": metrics.summary()},
+                      output_file, indent=2, sort_keys=True)
+        print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
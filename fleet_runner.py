@@ -0,0 +1,210 @@
+"""Run the popup flow for many accounts, sharded across a pool of worker processes.
+
+Usage:
+    python fleet_runner.py --accounts accounts.json --workers 4
+
+The accounts file is a JSON list of objects:
+    [{"service": "robota", "username": "...", "password": "..."},
+     {"service": "djinni", "username": "...", "password": "..."}]
+
+Djinni profiles are reactivated when JINNY_REACTIVATE=1, as in main_jinny.py;
+a "reactivate": true/false entry overrides that for one account.
+"""
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from functools import partial
+
+from dotenv import load_dotenv
+
+from api.robota_api_headers import api_headers
+from api.auth import Auth
+from api.robota_api import Robota_API, POPUP_RESUME_FIELDS
+from api.jinni_api import Jinny_API
+from utils.credential_cache import CredentialCache
+from utils.logger import log_context, setup_logger
+from utils.request_utils.connection_pool import adapter_from_env, build_session
+from utils.request_utils.request_metrics import RequestMetrics, export_metrics
+
+
+# Set once per worker process by _init_worker
+logger = None
+http_adapter = None
+
+
+def _init_worker():
+    """Pay the logger setup once per worker process instead of once per account"""
+    global logger, http_adapter
+    load_dotenv()
+    logger = setup_logger("fleet")
+    # One adapter per worker, mounted on every account session: connections are kept alive
+    # across accounts, the AIMD controller sees the whole worker's traffic, and the
+    # SQLite-backed rate limiter buckets are shared by all workers
+    http_adapter = adapter_from_env(logger)
+
+
+def run_robota_account(account, popup_concurrency=5):
+    """Log in to robota.ua and pop up every active resume of one account"""
+    result = {"service": "robota", "username": account["username"], "ok": False, "popped": [], "failed": []}
+
+    # Every account needs its own session and headers, Auth writes the token into them
+    session = build_session(adapter=http_adapter)
+    headers = dict(api_headers)
+    robota_auth = Auth(session=session,
+                api_headers=headers,
+                username=account["username"], password=account["password"],
+                logger=logger,
+                credential_cache=CredentialCache(logger=logger))
+    if not robota_auth.login():
+        result["error"] = "login failed"
+        return result
+
+    robota = Robota_API(session=session, api_headers=headers, logger=logger)
+    resume_data = robota.get_all_resume_data(fields=POPUP_RESUME_FIELDS)
+    if resume_data is None and robota.last_status_code == 401 and robota_auth.login(force=True):
+        resume_data = robota.get_all_resume_data(fields=POPUP_RESUME_FIELDS)
+    if resume_data is None:
+        result["error"] = "failed to fetch resumes"
+        return result
+
+    popup_results = robota.popup_resumes(robota.get_active_resume_id_list(), concurrency=popup_concurrency)
+    for resume_id, popped_id in popup_results.items():
+        (result["popped"] if popped_id else result["failed"]).append(resume_id)
+
+    result["ok"] = not result["failed"]
+    return result
+
+
+def run_jinny_account(account):
+    """Log in to djinni.co, optionally reactivate the profile, and load the inbox of one account"""
+    result = {"service": "djinni", "username": account["username"], "ok": False, "popped": [], "failed": [],
+              "reactivated": False}
+    reactivate = account.get("reactivate", os.getenv("JINNY_REACTIVATE", "0") == "1")
+
+    djinny = Jinny_API(username=account["username"], password=account["password"], logger=logger,
+                       credential_cache=CredentialCache(logger=logger),
+                       session=build_session(adapter=http_adapter))
+    if not djinny.login():
+        result["error"] = "login failed"
+        return result
+
+    errors = []
+    if reactivate:
+        result["reactivated"] = djinny.reactivate()
+        if not result["reactivated"]:
+            errors.append("reactivation failed")
+
+    # A failed bump still marks the account failed, but must not hide its unread threads
+    inbox_threads = djinny.iter_inbox_threads("https://djinni.co/my/inbox/")
+    if inbox_threads is None:
+        errors.append("failed to fetch inbox")
+    else:
+        result["unread_threads"] = [thread.id for thread in inbox_threads if thread.unread]
+
+    if errors:
+        result["error"] = ", ".join(errors)
+    result["ok"] = not errors
+    return result
+
+
+ACCOUNT_RUNNERS = {
+    "robota": run_robota_account,
+    "djinni": run_jinny_account,
+}
+
+
+def run_account(account):
+    """Run one account, turning any failure into an error result"""
+    runner = ACCOUNT_RUNNERS.get(account.get("service"))
+    if not runner:
+        return {"service": account.get("service"), "username": account.get("username"),
+                "ok": False, "popped": [], "failed": [], "error": "unknown service"}
+    try:
+        # Every line logged for this account (also from popup threads) carries its username
+        with log_context(account=account.get("username")):
+            return runner(account)
+    except Exception as e:
+        logger.error("Unexpected error for %s account %s: %s", account.get("service"), account.get("username"), e)
+        return {"service": account.get("service"), "username": account.get("username"),
+                "ok": False, "popped": [], "failed": [], "error": str(e)}
+
+
+def run_shard(accounts, account_concurrency=1):
+    """Process one shard of accounts inside a worker process, `account_concurrency` at a time.
+
+    The work is mostly waiting on the network, so threads overlap the accounts of a shard
+    while the shared adapter's rate limiter and AIMD controller keep the hosts in check.
+    """
+    if account_concurrency <= 1:
+        results = [run_account(account) for account in accounts]
+    else:
+        with ThreadPoolExecutor(max_workers=account_concurrency) as executor:
+            results = list(executor.map(run_account, accounts))
+    logger.info(f"Worker {os.getpid()} connection pool stats: {http_adapter.pool_stats.summary()}")
+    # Workers only collect, the parent merges every shard's metrics into one export
+    metrics = http_adapter.metrics.snapshot(reset=True) if http_adapter.metrics else None
+    return {"results": results, "metrics": metrics}
+
+
+def shard_accounts(accounts, shard_count):
+    """Split accounts round-robin into at most `shard_count` non-empty shards"""
+    shards = [accounts[index::shard_count] for index in range(max(1, shard_count))]
+    return [shard for shard in shards if shard]
+
+
+def summarize(results):
+    """Aggregate per-account results into totals"""
+    return {
+        "accounts": len(results),
+        "succeeded": sum(1 for result in results if result["ok"]),
+        "failed_accounts": [f"{result['service']}:{result['username']} ({result.get('error', 'popup errors')})"
+                            for result in results if not result["ok"]],
+        "resumes_popped": sum(len(result["popped"]) for result in results),
+        "resumes_failed": sum(len(result["failed"]) for result in results),
+        "profiles_reactivated": sum(1 for result in results if result.get("reactivated")),
+        "unread_threads": sum(len(result.get("unread_threads", ())) for result in results),
+    }
+
+
+def load_accounts(path):
+    with open(path, "r", encoding="utf-8") as accounts_file:
+        return json.load(accounts_file)
+
+
+def main():
+    # Workers load it again in _init_worker, the parent needs it for defaults and the metrics export
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Run popups for many accounts in parallel")
+    parser.add_argument("--accounts", default=os.getenv("FLEET_ACCOUNTS_FILE", "accounts.json"))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("FLEET_WORKERS", str(os.cpu_count() or 1))))
+    parser.add_argument("--account-concurrency", type=int,
+                        default=int(os.getenv("FLEET_ACCOUNT_CONCURRENCY", "1")),
+                        help="accounts processed at once inside each worker process")
+    args = parser.parse_args()
+
+    accounts = load_accounts(args.accounts)
+    shards = shard_accounts(accounts, args.workers)
+
+    results = []
+    metrics = RequestMetrics()
+    with ProcessPoolExecutor(max_workers=len(shards) or 1, initializer=_init_worker) as executor:
+        futures = [executor.submit(partial(run_shard, account_concurrency=args.account_concurrency), shard)
+                   for shard in shards]
+        for future in as_completed(futures):
+            shard_result = future.result()
+            results.extend(shard_result["results"])
+            if shard_result["metrics"]:
+                metrics.merge(shard_result["metrics"])
+    export_metrics(metrics)
+
+    summary = summarize(results)
+    print(f"Accounts: {summary['accounts']}, succeeded: {summary['succeeded']}")
+    print(f"Resumes popped: {summary['resumes_popped']}, failed: {summary['resumes_failed']}")
+    print(f"Djinni profiles reactivated: {summary['profiles_reactivated']}")
+    for failed_account in summary["failed_accounts"]:
+        print(f"🔴 {failed_account}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,6 @@
+import atexit
 import os
 from dotenv import load_dotenv
-import requests
-import json
-from bs4 import BeautifulSoup
 
 # Load the API headers from a separate file
 from api.robota_api_headers import api_headers
@@ -10,6 +8,10 @@ from api.auth import Auth
 from api.robota_api import Robota_API
 
 from api.jinni_api import Jinny_API
+from api.jinni_crawler import CrawlState, JinnyCrawler, LISTINGS
+from utils.credential_cache import CredentialCache
+from utils.request_utils.connection_pool import session_from_env
+from utils.request_utils.request_metrics import export_metrics
 
 
 # Load environment variables from .env file
@@ -18,17 +20,49 @@ load_dotenv()
 # Set up logging
 from utils.logger import setup_logger
 logger = setup_logger("jinny_api")
+# PROFILE=cprofile|sample|both and/or PROFILE_MEMORY=1 profile the whole run
+from utils.profiling import profiling_from_env
+profiling_from_env("jinny_api", logger)
 
 USERNAME = os.getenv("JINNY_USERNAME")
 PASSWORD = os.getenv("JINNY_PASSWORD")
+# Listings to sync incrementally after the inbox page, comma-separated ("inbox", "jobs")
+CRAWL_LISTINGS = [name.strip() for name in os.getenv("JINNY_CRAWL_LISTINGS", "").split(",") if name.strip()]
+CRAWL_WORKERS = int(os.getenv("JINNY_CRAWL_WORKERS", "4"))
+# Bump the profile to the top of the candidate list on every run
+REACTIVATE = os.getenv("JINNY_REACTIVATE", "0") == "1"
 
 
-djinny = Jinny_API(username=USERNAME, password=PASSWORD, logger=logger)
+session = session_from_env(logger)
+# Per-host/per-operation timing histograms, written to HTTP_METRICS_FILE however the run ends
+atexit.register(export_metrics, session.get_adapter("https://").metrics, logger)
+
+djinny = Jinny_API(username=USERNAME, password=PASSWORD, logger=logger,
+                   credential_cache=CredentialCache(logger=logger),
+                   session=session)
 
 djinny.login()
-inbox_response = djinny.get_authenticated_page("https://djinni.co/my/inbox/")
+if REACTIVATE:
+    print("Profile reactivated!" if djinny.reactivate() else "🔴 Profile reactivation failed. See log for details")
+
+inbox_threads = djinny.iter_inbox_threads("https://djinni.co/my/inbox/")
+if inbox_threads is None:
+    print("Failed to retrieve authenticated page")
+    exit()
 
-print(inbox_response.text[:500]) if inbox_response else print("Failed to retrieve authenticated page")
+for thread in inbox_threads:
+    marker = "*" if thread.unread else " "
+    print(f"{marker} {thread.id} {thread.correspondent or '-'}: {thread.preview or ''}")
 
-soup = BeautifulSoup(inbox_response.text, 'html.parser')
-print(soup.prettify())
\ No newline at end of file
+# Walk the paginated listings, fetching only what changed since the last run
+if CRAWL_LISTINGS:
+    crawl_state = CrawlState()
+    crawler = JinnyCrawler(djinny, crawl_state, logger=logger, max_workers=CRAWL_WORKERS)
+    for listing_name in CRAWL_LISTINGS:
+        crawl_result = crawler.crawl(LISTINGS[listing_name])
+        if crawl_result is None:
+            print(f"Failed to sync {listing_name}")
+            continue
+        print(f"{listing_name}: {len(crawl_result['items'])} new items "
+              f"({crawl_result['pages_fetched']} pages fetched, stopped by {crawl_result['stopped_by']})")
+    crawl_state.close()
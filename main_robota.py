@@ -1,6 +1,6 @@
+import atexit
 import os
 from dotenv import load_dotenv
-import requests
 import json
 from bs4 import BeautifulSoup
 
@@ -8,6 +8,10 @@ from bs4 import BeautifulSoup
 from api.robota_api_headers import api_headers
 from api.auth import Auth
 from api.robota_api import Robota_API
+from utils.credential_cache import CredentialCache
+from utils.resume_store import ResumeStore
+from utils.request_utils.connection_pool import session_from_env
+from utils.request_utils.request_metrics import export_metrics
 
 
 # Load environment variables from .env file
@@ -16,48 +20,112 @@ load_dotenv()
 # Set up logging
 from utils.logger import setup_logger
 logger = setup_logger("rabota_api")
+# PROFILE=cprofile|sample|both and/or PROFILE_MEMORY=1 profile the whole run
+from utils.profiling import profiling_from_env
+profiling_from_env("rabota_api", logger)
 
 USERNAME = os.getenv("ROBOTA_USERNAME")
 PASSWORD = os.getenv("ROBOTA_PASSWORD")
-
-session = requests.Session()
+POPUP_CONCURRENCY = int(os.getenv("ROBOTA_POPUP_CONCURRENCY", "5"))
+# "batch" sends all popups as one aliased GraphQL mutation, "concurrent" sends one request per resume
+POPUP_MODE = os.getenv("ROBOTA_POPUP_MODE", "concurrent")
+# "http" logs in with plain requests, "browser" logs in with Selenium and hands the session over,
+# "auto" tries plain requests first and falls back to the browser when the HTTP login is blocked
+LOGIN_MODE = os.getenv("ROBOTA_LOGIN_MODE", "http")
+# Send GraphQL operations as Automatic Persisted Queries (hash first, full text on demand)
+PERSISTED_QUERIES = os.getenv("ROBOTA_PERSISTED_QUERIES", "0") == "1"
+# Comma-separated resume fields to fetch into the snapshot ("all" = the full browser query).
+# The default is just enough for the popup run and for spotting changed resumes.
+RESUME_FIELDS = os.getenv("ROBOTA_RESUME_FIELDS", "id,title,updateDate,state.state")
+RESUME_FIELDS = None if RESUME_FIELDS == "all" else [field.strip() for field in RESUME_FIELDS.split(",") if field.strip()]
+
+# Pooled session: every request goes through the per-host rate limiter shared with other runs
+# and the adaptive (AIMD) in-flight limit driven by 429/5xx and latency
+session = session_from_env(logger)
+http_adapter = session.get_adapter("https://")
+# Per-host/per-operation timing histograms, written to HTTP_METRICS_FILE however the run ends
+atexit.register(export_metrics, http_adapter.metrics, logger)
+
+credential_cache = CredentialCache(logger=logger)
 
 # Initialize Auth class
-robota_auth = Auth(session=session, 
+http_auth = Auth(session=session, 
             api_headers=api_headers, 
             username=USERNAME, password=PASSWORD, 
             touch_url="https://robota.ua/auth/login",
             login_url="https://auth-api.robota.ua/Login", 
-            logger=logger)
+            logger=logger,
+            credential_cache=credential_cache)
+
+
+def build_browser_auth():
+    """Selenium is only needed (and imported) when the browser login is actually used"""
+    from api.browser_auth import BrowserAuth
+
+    return BrowserAuth(session=session,
+            api_headers=api_headers,
+            username=USERNAME, password=PASSWORD,
+            logger=logger,
+            credential_cache=credential_cache,
+            driver_path=os.getenv("CHROMEDRIVER_PATH"),
+            headless=os.getenv("SELENIUM_HEADLESS", "1") == "1")
+
+
+robota_auth = build_browser_auth() if LOGIN_MODE == "browser" else http_auth
     
 # Perform login
 api_headers = robota_auth.login()
+if not api_headers and LOGIN_MODE == "auto":
+    logger.info("HTTP login failed. Falling back to browser login handoff.")
+    robota_auth = build_browser_auth()
+    api_headers = robota_auth.login()
 if not api_headers:
     print("🔴 Login failed. See log for details")
     exit()
 
 print("Login successful!")
-robota = Robota_API(session=session, api_headers=api_headers, logger=logger)
-# Get all resume data
-resume_data = robota.get_all_resume_data()
-if not resume_data or len(resume_data) == 0:
+robota = Robota_API(session=session, api_headers=api_headers, logger=logger,
+                    persisted_queries=PERSISTED_QUERIES)
+resume_store = ResumeStore()
+# Get all resume data and sync it into the local snapshot
+changes = robota.sync_resumes(resume_store, USERNAME, fields=RESUME_FIELDS)
+if changes is None and robota.last_status_code == 401:
+    # The cached token was rejected, log in from scratch and try once more
+    logger.info("Token rejected with 401. Performing full login.")
+    if not robota_auth.login(force=True):
+        print("🔴 Login failed. See log for details")
+        exit()
+    changes = robota.sync_resumes(resume_store, USERNAME, fields=RESUME_FIELDS)
+if changes is None or not robota.resume_list:
     print("No resume data found!")
     exit()
 print("Resume data retrieved successfully!")
-# Extract active resume IDs
-active_ids = robota.get_active_resume_id_list()
+# Extract active resume IDs from the snapshot
+active_ids = resume_store.ids_by_state(USERNAME, "ACTIVE")
 
 # =======================================================================================
 # Pop up the resume
 
-for resume_id in active_ids:
+# Pop up all active resumes in one batched mutation or concurrently
+if POPUP_MODE == "batch":
+    popup_results = robota.popup_resumes_batch(active_ids)
+else:
+    popup_results = robota.popup_resumes(active_ids, concurrency=POPUP_CONCURRENCY)
 
-    # Pop up the resume
-    if robota.popup_resume(resume_id):
+for resume_id, popped_id in popup_results.items():
+    if popped_id:
         print(f"Resume {resume_id} popped up successfully!")
     else:
         print(f"Failed to pop up resume {resume_id}.")
 
+if http_adapter.concurrency_controller:
+    for host, host_metrics in http_adapter.concurrency_controller.metrics().items():
+        logger.info(f"Adaptive concurrency for {host}: limit={host_metrics['limit']}, "
+                    f"increases={host_metrics['increases']}, decreases={host_metrics['decreases']}")
+for host, host_stats in http_adapter.pool_stats.summary().items():
+    logger.info(f"Connection pool for {host}: requests={host_stats['requests']}, "
+                f"new_connections={host_stats['new_connections']}, reuse_ratio={host_stats['reuse_ratio']}")
+
 # =======================================================================================
 # Profile page actions
 
@@ -66,19 +134,11 @@ for resume_id in active_ids:
 profile_url = "https://robota.ua/my/profile"
 
 # Send the GET request to the profile page using the same session (with authenticated cookies)
-try:
-    profile_response = session.get(profile_url, headers=api_headers)
-    
-    if profile_response.status_code == 200:
-        print("🟢 GET request to profile page successful!")
-    else:
-        print(f"🔴 GET request to profile page failed with status code: {profile_response.status_code}")
-        print(profile_response.text[:500])
-        exit()
-
-except requests.exceptions.RequestException as e:
-    print(f"🔴 An error occurred during GET request to profile page: {e}")
+profile_response = robota.transport.request("GET", profile_url, expected_status=(200,), headers=api_headers)
+if profile_response is None:
+    print("🔴 GET request to profile page failed. See log for details")
     exit()
+print("🟢 GET request to profile page successful!")
 
 # Parse the profile page HTML with BeautifulSoup
 soup = BeautifulSoup(profile_response.text, 'html.parser')
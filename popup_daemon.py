@@ -0,0 +1,158 @@
+"""Long-running popup daemon for robota.ua accounts.
+
+Keeps one warm session per account and pops up every active resume as soon as its
+cooldown expires, instead of re-logging in and blindly popping up from cron.
+
+Usage:
+    python popup_daemon.py --accounts accounts.json
+"""
+import argparse
+import os
+import random
+import time
+from collections import defaultdict
+
+from dotenv import load_dotenv
+
+from api.robota_api_headers import api_headers
+from api.auth import Auth
+from api.robota_api import Robota_API, POPUP_RESUME_FIELDS
+from fleet_runner import load_accounts
+from utils.credential_cache import CredentialCache
+from utils.logger import log_context, setup_logger
+from utils.popup_scheduler import CooldownStore, PopupScheduler
+from utils.profiling import profiling_from_env
+from utils.request_utils.connection_pool import adapter_from_env, build_session
+from utils.request_utils.request_metrics import export_metrics
+
+
+# Load environment variables from .env file
+load_dotenv()
+
+logger = setup_logger("popup_daemon")
+
+# Seconds between two successful popups of the same resume
+POPUP_COOLDOWN = int(os.getenv("ROBOTA_POPUP_COOLDOWN", "3600"))
+# Seconds to wait before retrying a failed popup
+RETRY_DELAY = int(os.getenv("ROBOTA_POPUP_RETRY_DELAY", "300"))
+# Seconds between resume list refreshes, to pick up new and deactivated resumes
+REFRESH_INTERVAL = int(os.getenv("ROBOTA_REFRESH_INTERVAL", "3600"))
+# Random spread added to every schedule, so accounts do not all fire in the same second
+JITTER = int(os.getenv("ROBOTA_POPUP_JITTER", "60"))
+POPUP_CONCURRENCY = int(os.getenv("ROBOTA_POPUP_CONCURRENCY", "5"))
+
+
+class AccountSession:
+    """Logged-in Auth + Robota_API pair kept alive for the lifetime of the daemon"""
+
+    def __init__(self, account, http_adapter):
+        self.username = account["username"]
+        self.session = build_session(adapter=http_adapter)
+        self.headers = dict(api_headers)
+        self.auth = Auth(session=self.session,
+                    api_headers=self.headers,
+                    username=account["username"], password=account["password"],
+                    logger=logger,
+                    credential_cache=CredentialCache(logger=logger))
+        self.robota = Robota_API(session=self.session, api_headers=self.headers, logger=logger)
+        self.refreshed_at = 0.0
+
+    def refresh_active_ids(self):
+        """Re-read the resume list, logging in again if the token was rejected"""
+        if "Authorization" not in self.headers and not self.auth.login():
+            return None
+        resume_data = self.robota.get_all_resume_data(fields=POPUP_RESUME_FIELDS)
+        if resume_data is None and self.robota.last_status_code == 401 and self.auth.login(force=True):
+            resume_data = self.robota.get_all_resume_data(fields=POPUP_RESUME_FIELDS)
+        if resume_data is None:
+            return None
+        self.refreshed_at = time.time()
+        return self.robota.get_active_resume_id_list()
+
+
+def schedule_account(account_session, scheduler, store):
+    """Put every active resume of the account on the schedule, keeping known cooldowns"""
+    active_ids = account_session.refresh_active_ids()
+    if active_ids is None:
+        logger.error(f"Failed to refresh resumes for {account_session.username}")
+        # Try again after the retry delay rather than on every loop iteration
+        account_session.refreshed_at = time.time() - REFRESH_INTERVAL + RETRY_DELAY
+        return
+
+    # Resumes that are no longer active must not be popped up
+    for resume_id in set(scheduler.scheduled_ids(account_session.username)) - set(active_ids):
+        scheduler.cancel(account_session.username, resume_id)
+
+    now = time.time()
+    for resume_id in active_ids:
+        if scheduler.scheduled(account_session.username, resume_id):
+            continue
+        next_attempt = store.next_attempt(account_session.username, resume_id) or now
+        scheduler.schedule(max(now, next_attempt) + random.uniform(0, JITTER), account_session.username, resume_id)
+    logger.info(f"{account_session.username}: {len(active_ids)} active resumes scheduled")
+
+
+def run_due_popups(due_items, account_sessions, scheduler, store):
+    """Pop up all due resumes, grouped per account, and schedule their next attempt"""
+    by_account = defaultdict(list)
+    for username, resume_id in due_items:
+        by_account[username].append(resume_id)
+
+    for username, resume_ids in by_account.items():
+        account_session = account_sessions[username]
+        with log_context(account=username):
+            popup_results = account_session.robota.popup_resumes(resume_ids, concurrency=POPUP_CONCURRENCY)
+        if not any(popup_results.values()):
+            # Everything failed, most likely an expired token: refresh (and re-login) on the next loop
+            account_session.refreshed_at = 0.0
+
+        now = time.time()
+        for resume_id, popped_id in popup_results.items():
+            if popped_id:
+                next_attempt = now + POPUP_COOLDOWN
+                store.record_success(username, resume_id, now, next_attempt)
+            else:
+                next_attempt = now + RETRY_DELAY
+                store.record_failure(username, resume_id, next_attempt)
+            scheduler.schedule(next_attempt + random.uniform(0, JITTER), username, resume_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pop up resumes whenever their cooldown expires")
+    parser.add_argument("--accounts", default=os.getenv("FLEET_ACCOUNTS_FILE", "accounts.json"))
+    args = parser.parse_args()
+    # Long-running: PROFILE_MEMORY=1 with PROFILE_MEMORY_INTERVAL reports allocation growth periodically
+    profiling_from_env("popup_daemon", logger)
+
+    http_adapter = adapter_from_env(logger)
+    accounts = [account for account in load_accounts(args.accounts) if account.get("service", "robota") == "robota"]
+    account_sessions = {account["username"]: AccountSession(account, http_adapter) for account in accounts}
+    scheduler = PopupScheduler()
+    store = CooldownStore()
+
+    try:
+        while True:
+            now = time.time()
+            for account_session in account_sessions.values():
+                if now - account_session.refreshed_at >= REFRESH_INTERVAL:
+                    schedule_account(account_session, scheduler, store)
+
+            due_items = scheduler.pop_due()
+            if due_items:
+                run_due_popups(due_items, account_sessions, scheduler, store)
+                continue
+
+            # Sleep until the next popup is due, but wake up for the next resume list refresh
+            next_refresh = min((s.refreshed_at + REFRESH_INTERVAL for s in account_sessions.values()),
+                               default=now + REFRESH_INTERVAL)
+            next_due = scheduler.next_due() or next_refresh
+            time.sleep(max(1.0, min(next_due, next_refresh) - time.time()))
+    except KeyboardInterrupt:
+        logger.info("Popup daemon stopped")
+    finally:
+        store.close()
+        export_metrics(http_adapter.metrics, logger)
+
+
+if __name__ == "__main__":
+    main()
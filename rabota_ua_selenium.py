@@ -2,10 +2,11 @@ import time
 import os
 
 from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
-from selenium.common.exceptions import NoSuchElementException
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import NoSuchElementException, TimeoutException
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -14,45 +15,42 @@ load_dotenv()
 # Set up logging
 from utils.logger import setup_logger
 logger = setup_logger()
+# PROFILE=cprofile|sample|both and/or PROFILE_MEMORY=1 profile the whole run
+from utils.profiling import profiling_from_env
+profiling_from_env("rabota_ua_selenium", logger)
+
+from api.browser_auth import build_chrome_options, block_resources, browser_login
 
 USERNAME = os.getenv("ROBOTA_USERNAME")
 PASSWORD = os.getenv("ROBOTA_PASSWORD")
 PROFILE_NAME = "Dan Chuzhov"  # Profile name to check
 
-chrome_options = Options()
-chrome_options.add_argument("--no-sandbox")
-chrome_options.add_argument("--disable-dev-shm-usage")
+# Headless mode also blocks images, fonts and analytics through CDP
+HEADLESS = os.getenv("SELENIUM_HEADLESS", "0") == "1"
+# Max seconds to wait for an element before giving up
+WAIT_TIMEOUT = int(os.getenv("SELENIUM_WAIT_TIMEOUT", "20"))
+# Seconds to keep the browser open at the end, so the user can actually see something
+LINGER = int(os.getenv("SELENIUM_LINGER", "0" if HEADLESS else "5"))
+
+POPUP_BUTTON_XPATH = "//button[contains(text(), 'Підняти в пошуку')]"
+
+chrome_options = build_chrome_options(headless=HEADLESS)
 # Put the path to your chromedriver file here
 service = Service("C:/Users/reach/Downloads/chromedriver-win32/chromedriver.exe")
 
+driver = None
 try:
     logger.info("Starting browser")
     driver = webdriver.Chrome(service=service, options=chrome_options)
-    
-    logger.info(f"Navigating to login page")
-    driver.get('https://robota.ua/auth/login')
-    time.sleep(5)  # Let the page load
+    wait = WebDriverWait(driver, WAIT_TIMEOUT)
+
+    if HEADLESS:
+        block_resources(driver)
 
     try:
-        # Input username
-        logger.info("Entering username")
-        username_input = driver.find_element(By.ID, 'otp-username')
-        username_input.send_keys(USERNAME)
-        username_input.send_keys('\n')  # Press Enter to validate the email
-        time.sleep(5)  # Wait for the password field to appear
-
-        # Input password
-        logger.info("Entering password")
-        password_input = driver.find_element(By.CSS_SELECTOR, 'input[type="password"]')
-        password_input.send_keys(PASSWORD)
-
-        # Submit the login form
-        logger.info("Clicking login button")
-        login_button = driver.find_element(By.CSS_SELECTOR, 'button[type="button"]')
-        login_button.click()
-        time.sleep(5)  # Let the page load after login
+        browser_login(driver, wait, USERNAME, PASSWORD, logger)
 
-    except NoSuchElementException as e:
+    except (NoSuchElementException, TimeoutException) as e:
         logger.error(f"Element not found during login: {e}")
         raise
 
@@ -61,23 +59,33 @@ try:
     try:
         logger.info("Navigating to profile page")
         driver.get('https://robota.ua/my/profile')
-        time.sleep(5)  # Let the page load after login
-        
+        wait.until(lambda d: d.execute_script("return document.readyState") == "complete")
+
         logger.info("Looking for 'Підняти в пошуку' buttons")
-        buttons = driver.find_elements(By.XPATH, "//button[contains(text(), 'Підняти в пошуку')]")
-        
+        try:
+            # The buttons are rendered by the SPA after the document is ready
+            buttons = wait.until(EC.presence_of_all_elements_located((By.XPATH, POPUP_BUTTON_XPATH)))
+        except TimeoutException:
+            buttons = []
+
         if not buttons:
             logger.info("No 'Підняти в пошуку' buttons found")
         else:
             logger.info(f"Found {len(buttons)} 'Підняти в пошуку' buttons")
-            
+
         for button in buttons:
             driver.execute_script("arguments[0].scrollIntoView(true);", button)
-            time.sleep(1)  # Wait for the element to be in view
+            wait.until(EC.element_to_be_clickable(button))
             driver.execute_script("arguments[0].click();", button)
             logger.info('Clicked "Підняти в пошуку" button')
-            time.sleep(2)  # Wait a bit between clicks
-            
+            # The click is handled once the button is disabled or re-rendered
+            try:
+                WebDriverWait(driver, 2).until(
+                    lambda d: EC.staleness_of(button)(d) or not button.is_enabled()
+                )
+            except TimeoutException:
+                pass
+
     except NoSuchElementException as e:
         logger.error(f"Element not found on profile page: {e}")
         raise
@@ -87,9 +95,10 @@ except Exception as e:
     raise
 
 finally:
-    time.sleep(5)  # Let the user actually see something!
+    time.sleep(LINGER)  # Let the user actually see something!
     try:
-        logger.info("Closing browser")
-        driver.quit()
+        if driver:
+            logger.info("Closing browser")
+            driver.quit()
     except Exception as e:
-        logger.error(f"Error while closing browser: {str(e)}")
\ No newline at end of file
+        logger.error(f"Error while closing browser: {str(e)}")
@@ -0,0 +1,55 @@
+"""Print robota.ua push notifications (resume views, messages) as they arrive.
+
+Listens on the socket-api websocket instead of re-polling the profile page and
+resume list. Needs the optional websockets package.
+
+Usage:
+    python robota_notifications.py
+"""
+import asyncio
+import json
+import os
+
+from dotenv import load_dotenv
+
+from api.robota_api_headers import api_headers
+from api.auth import Auth
+from api.robota_api import Robota_API
+from utils.credential_cache import CredentialCache
+from utils.logger import setup_logger
+from utils.request_utils.connection_pool import session_from_env
+
+
+# Load environment variables from .env file
+load_dotenv()
+
+logger = setup_logger("robota_notifications")
+
+
+def print_event(event):
+    print(f"{event.type}: {json.dumps(event.data, ensure_ascii=False, default=str)}")
+
+
+def main():
+    session = session_from_env(logger)
+    auth = Auth(session=session,
+                api_headers=api_headers,
+                username=os.getenv("ROBOTA_USERNAME"), password=os.getenv("ROBOTA_PASSWORD"),
+                logger=logger,
+                credential_cache=CredentialCache(logger=logger))
+    headers = auth.login()
+    if not headers:
+        print("🔴 Login failed. See log for details")
+        return
+
+    robota = Robota_API(session=session, api_headers=headers, logger=logger)
+    listener = robota.socket_listener(on_event=print_event,
+                                      backoff_max=float(os.getenv("ROBOTA_SOCKET_BACKOFF_MAX", "60")))
+    try:
+        asyncio.run(listener.run())
+    except KeyboardInterrupt:
+        logger.info("Notification listener stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import base64
+import hashlib
+import json
+import os
+import time
+from typing import Optional
+
+
+class CredentialCache:
+    """On-disk cache of session credentials (tokens, cookies) keyed by service and username"""
+
+    def __init__(self, cache_dir: str = "cache", logger=None):
+        self.cache_dir = cache_dir
+        self.logger = logger
+
+    def _path(self, service: str, username: str) -> str:
+        # Hash the username so e-mails never end up in file names
+        digest = hashlib.sha256(f"{service}:{username}".encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.cache_dir, f"{service}_{digest}.json")
+
+    def load(self, service: str, username: str) -> Optional[dict]:
+        """Return cached credentials or None if there is nothing usable on disk"""
+        path = self._path(service, username)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as cache_file:
+                return json.load(cache_file)
+        except (OSError, json.JSONDecodeError) as e:
+            if self.logger:
+                self.logger.error(f"Failed to read credential cache {path}: {e}")
+            return None
+
+    def save(self, service: str, username: str, data: dict) -> None:
+        """Atomically write credentials, readable by the current user only"""
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+        path = self._path(service, username)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w", encoding="utf-8") as cache_file:
+                json.dump({**data, "saved_at": time.time()}, cache_file)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            if self.logger:
+                self.logger.error(f"Failed to write credential cache {path}: {e}")
+
+    def delete(self, service: str, username: str) -> None:
+        """Forget cached credentials"""
+        try:
+            os.remove(self._path(service, username))
+        except FileNotFoundError:
+            pass
+
+
+def dump_cookies(cookie_jar) -> list:
+    """Serialize a requests cookie jar into a JSON-friendly list"""
+    return [
+        {
+            "name": cookie.name,
+            "value": cookie.value,
+            "domain": cookie.domain,
+            "path": cookie.path,
+            "expires": cookie.expires,
+            "secure": cookie.secure,
+        }
+        for cookie in cookie_jar
+    ]
+
+
+def load_cookies(cookie_jar, cookies: list) -> None:
+    """Restore cookies produced by dump_cookies into a requests cookie jar"""
+    for cookie in cookies:
+        cookie_jar.set(
+            cookie["name"],
+            cookie["value"],
+            domain=cookie.get("domain", ""),
+            path=cookie.get("path", "/"),
+            expires=cookie.get("expires"),
+            secure=cookie.get("secure", False),
+        )
+
+
+def decode_jwt_expiry(token: str) -> Optional[float]:
+    """Return the `exp` claim of a JWT (without verifying the signature) or None"""
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload))
+        return float(claims["exp"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+def is_jwt_valid(token: str, leeway: int = 60) -> bool:
+    """Check that a JWT has not expired yet, keeping `leeway` seconds of safety margin"""
+    expiry = decode_jwt_expiry(token)
+    return expiry is not None and expiry - leeway > time.time()
@@ -1,36 +1,157 @@
+import atexit
+import contextlib
+import contextvars
+import json
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# Extra record attributes copied into structured (JSON) log lines
+STRUCTURED_FIELDS = ("account", "host", "operation", "method", "status", "latency", "resume_id")
+
+_setup_lock = threading.Lock()
+
+# Fields bound for the current task/thread, e.g. the account a fleet worker is processing
+_log_context = contextvars.ContextVar("log_context", default={})
+
+
+@contextlib.contextmanager
+def log_context(**fields):
+    """Attach `fields` (account=..., ...) to every record logged inside the block"""
+    token = _log_context.set({**_log_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _log_context.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        for name, value in _log_context.get().items():
+            if not hasattr(record, name):
+                setattr(record, name, value)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Thin out repetitive lines logged with extra={"sample": True}.
+
+    The first `burst` records of each message template pass, then one in `every`.
+    Templates are counted before %-formatting, so per-resume lines share one counter.
+    """
+
+    def __init__(self, burst: int = 10, every: int = 100):
+        super().__init__()
+        self.burst = burst
+        self.every = every
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, "sample", False):
+            return True
+        with self._lock:
+            count = self._counts.get(record.msg, 0) + 1
+            self._counts[record.msg] = count
+        return count <= self.burst or count % self.every == 0
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the structured fields that are set on the record"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in STRUCTURED_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class LazyQueueHandler(QueueHandler):
+    """QueueHandler that leaves %-formatting to the listener thread.
+
+    The stock prepare() formats the message in the caller; only the traceback,
+    which cannot outlive the caller's frame, is rendered here.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
 
 def setup_logger(service_name: str = "api") -> logging.Logger:
+    """Logger for one service (log/<service_name>.log plus console).
+
+    Calling it again for the same service returns the configured logger instead of
+    stacking more handlers. Environment switches:
+        LOG_LEVEL (INFO), LOG_MAX_BYTES (10MB), LOG_BACKUP_COUNT (5),
+        LOG_JSON=1 for one JSON object per line,
+        LOG_QUEUE=1 to hand records to a background thread (QueueHandler/QueueListener),
+        LOG_SAMPLE_BURST (10) / LOG_SAMPLE_EVERY (100) for lines logged with extra={"sample": True}.
+    """
+    with _setup_lock:
+        logger = logging.getLogger(service_name)
+        if not getattr(logger, "_service_configured", False):
+            _configure(logger, service_name)
+            logger._service_configured = True
+    return logger
+
+
+def _configure(logger: logging.Logger, service_name: str) -> None:
     # Create log directory if it doesn't exist
     if not os.path.exists('log'):
         os.makedirs('log')
-    
-    # Create a custom logger
-    logger = logging.getLogger(__name__)
-    logger.setLevel(logging.INFO)
-    
-    # Create handlers (1MB max size, keep 1 backup)
+
+    logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    # Our handlers are complete, do not repeat every line through the root logger
+    logger.propagate = False
+
     log_file_path = os.path.join('log', f'{service_name}.log')
     handler = RotatingFileHandler(
         log_file_path,
-        maxBytes=1024*1024,  # 1MB
-        backupCount=1,
+        maxBytes=int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024))),
+        backupCount=int(os.getenv("LOG_BACKUP_COUNT", "5")),
         encoding='utf-8'
     )
-    
-    # Create formatters and add it to handlers
-    formatter = logging.Formatter('%(asctime)s,%(levelname)s,%(message)s', datefmt='%Y-%m-%d %H:%M:%S')
-    handler.setFormatter(formatter)
-    
-    # Add handlers to the logger
-    logger.addHandler(handler)
-    
-    # Also log to console
     console_handler = logging.StreamHandler()
+
+    if os.getenv("LOG_JSON", "0") == "1":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s,%(levelname)s,%(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    handler.setFormatter(formatter)
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-    
-    return logger
 
+    # Filters run in the calling thread: context must be captured there, and sampled-out
+    # records should not even reach the queue
+    logger.addFilter(ContextFilter())
+    logger.addFilter(SamplingFilter(
+        burst=int(os.getenv("LOG_SAMPLE_BURST", "10")),
+        every=int(os.getenv("LOG_SAMPLE_EVERY", "100")),
+    ))
+
+    if os.getenv("LOG_QUEUE", "0") == "1":
+        # File and console I/O happen on the listener thread, logging calls only enqueue
+        log_queue = queue.SimpleQueue()
+        listener = QueueListener(log_queue, handler, console_handler, respect_handler_level=True)
+        listener.start()
+        atexit.register(listener.stop)
+        logger.addHandler(LazyQueueHandler(log_queue))
+        logger._queue_listener = listener
+    else:
+        logger.addHandler(handler)
+        logger.addHandler(console_handler)
@@ -0,0 +1,104 @@
+import heapq
+import itertools
+import os
+import sqlite3
+import time
+from typing import List, Optional, Tuple
+
+
+class CooldownStore:
+    """SQLite record of the last successful popup and the next planned attempt per resume"""
+
+    def __init__(self, db_path: str = os.path.join("cache", "popup_state.sqlite")):
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir, exist_ok=True)
+        self.connection = sqlite3.connect(db_path)
+        self.connection.execute(
+            """CREATE TABLE IF NOT EXISTS popups (
+                account TEXT NOT NULL,
+                resume_id TEXT NOT NULL,
+                last_popup REAL,
+                next_attempt REAL,
+                PRIMARY KEY (account, resume_id)
+            )"""
+        )
+        self.connection.commit()
+
+    def record_success(self, account: str, resume_id, popped_at: float, next_attempt: float) -> None:
+        self.connection.execute(
+            "INSERT OR REPLACE INTO popups (account, resume_id, last_popup, next_attempt) VALUES (?, ?, ?, ?)",
+            (account, str(resume_id), popped_at, next_attempt),
+        )
+        self.connection.commit()
+
+    def record_failure(self, account: str, resume_id, next_attempt: float) -> None:
+        self.connection.execute(
+            """INSERT INTO popups (account, resume_id, next_attempt) VALUES (?, ?, ?)
+               ON CONFLICT (account, resume_id) DO UPDATE SET next_attempt = excluded.next_attempt""",
+            (account, str(resume_id), next_attempt),
+        )
+        self.connection.commit()
+
+    def next_attempt(self, account: str, resume_id) -> Optional[float]:
+        row = self.connection.execute(
+            "SELECT next_attempt FROM popups WHERE account = ? AND resume_id = ?",
+            (account, str(resume_id)),
+        ).fetchone()
+        return row[0] if row else None
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+class PopupScheduler:
+    """Priority queue of (due time, account, resume ID) popup attempts.
+
+    Rescheduling a resume supersedes its earlier entry; stale heap entries are
+    skipped lazily when they surface, so every operation stays O(log n).
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int, str, str]] = []
+        self._due = {}
+        self._counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def schedule(self, due: float, account: str, resume_id) -> None:
+        key = (account, resume_id)
+        self._due[key] = due
+        heapq.heappush(self._heap, (due, next(self._counter), account, resume_id))
+
+    def cancel(self, account: str, resume_id) -> None:
+        self._due.pop((account, resume_id), None)
+
+    def scheduled(self, account: str, resume_id) -> bool:
+        return (account, resume_id) in self._due
+
+    def scheduled_ids(self, account: str) -> List[str]:
+        return [resume_id for scheduled_account, resume_id in self._due if scheduled_account == account]
+
+    def _drop_stale(self) -> None:
+        while self._heap:
+            due, _, account, resume_id = self._heap[0]
+            if self._due.get((account, resume_id)) == due:
+                return
+            heapq.heappop(self._heap)
+
+    def next_due(self) -> Optional[float]:
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: Optional[float] = None) -> List[Tuple[str, str]]:
+        """Remove and return every (account, resume_id) whose due time has come"""
+        now = time.time() if now is None else now
+        due_items = []
+        while True:
+            self._drop_stale()
+            if not self._heap or self._heap[0][0] > now:
+                return due_items
+            _, _, account, resume_id = heapq.heappop(self._heap)
+            del self._due[(account, resume_id)]
+            due_items.append((account, resume_id))
@@ -0,0 +1,178 @@
+"""Opt-in profiling for the entry point scripts, switched on from the environment.
+
+    PROFILE=cprofile      deterministic cProfile: <name>.prof (pstats, for snakeviz/gprof2dot)
+    PROFILE=sample        wall-clock stack sampler: <name>.folded (flamegraph.pl / speedscope)
+    PROFILE=both          both of the above
+    PROFILE_MEMORY=1      tracemalloc: top allocation sites and growth since start
+    PROFILE_DIR (log/profile), PROFILE_TOP (25), PROFILE_INTERVAL (0.005 s between samples),
+    PROFILE_MEMORY_INTERVAL (0 = off; seconds between growth reports in long-running modes)
+
+Every run also writes <name>-top.txt with the top-N hot functions. Files are
+named <service>-<timestamp> and written when the process exits. cProfile only
+sees the thread that started it; the sampler covers every thread.
+"""
+import atexit
+import cProfile
+import io
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import List, Optional, Tuple
+
+
+class SamplingProfiler:
+    """Samples the stacks of all other threads every `interval` seconds.
+
+    Counts are wall-clock: a thread blocked on the network shows up where it waits,
+    which is what we want for I/O-heavy scripts.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stopping = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _label(code) -> str:
+        return f"{os.path.basename(code.co_filename)}:{code.co_name}:{code.co_firstlineno}".replace(" ", "_")
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stopping.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def write_folded(self, path: str) -> None:
+        """One "frame;frame;frame count" line per distinct stack"""
+        with open(path, "w", encoding="utf-8") as folded_file:
+            for stack, count in self.stacks.most_common():
+                folded_file.write(f"{stack} {count}\n")
+
+    def top(self, limit: int) -> List[Tuple[str, int, int]]:
+        """(function, self samples, total samples) of the hottest functions by self samples"""
+        own, total = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        return [(frame, count, total[frame]) for frame, count in own.most_common(limit)]
+
+
+class MemoryTracer:
+    """tracemalloc wrapper reporting the biggest allocation sites and growth since start"""
+
+    def __init__(self, logger, frames: int = 10, report_interval: float = 0):
+        self.logger = logger
+        tracemalloc.start(frames)
+        self.baseline = tracemalloc.take_snapshot()
+        self._stopping = threading.Event()
+        self._thread = None
+        if report_interval > 0:
+            self._thread = threading.Thread(target=self._report_growth, args=(report_interval,),
+                                            name="memory-tracer", daemon=True)
+            self._thread.start()
+
+    def _report_growth(self, interval: float) -> None:
+        previous = self.baseline
+        while not self._stopping.wait(interval):
+            snapshot = tracemalloc.take_snapshot()
+            for stat in snapshot.compare_to(previous, "lineno")[:5]:
+                self.logger.info("Memory growth: %s", stat)
+            previous = snapshot
+
+    def report(self, limit: int) -> str:
+        self._stopping.set()
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        lines = [f"Traced memory: current={current / 1024:.1f} KiB, peak={peak / 1024:.1f} KiB",
+                 "", f"Top {limit} allocation sites:"]
+        lines += [str(stat) for stat in snapshot.statistics("lineno")[:limit]]
+        lines += ["", f"Top {limit} growth since start:"]
+        lines += [str(stat) for stat in snapshot.compare_to(self.baseline, "lineno")[:limit]]
+        return "\n".join(lines)
+
+
+class ProfilingSession:
+    """Profilers selected by the environment, stopped and written out at exit"""
+
+    def __init__(self, service_name: str, mode: str, memory: bool, logger=None):
+        self.logger = logger or logging.getLogger(__name__)
+        self.top = int(os.getenv("PROFILE_TOP", "25"))
+        output_dir = os.getenv("PROFILE_DIR", os.path.join("log", "profile"))
+        os.makedirs(output_dir, exist_ok=True)
+        self.prefix = os.path.join(output_dir, f"{service_name}-{time.strftime('%Y%m%d-%H%M%S')}")
+
+        self.profile = cProfile.Profile() if mode in ("cprofile", "both") else None
+        self.sampler = SamplingProfiler(float(os.getenv("PROFILE_INTERVAL", "0.005"))) \
+            if mode in ("sample", "both") else None
+        self.memory = MemoryTracer(self.logger, report_interval=float(os.getenv("PROFILE_MEMORY_INTERVAL", "0"))) \
+            if memory else None
+
+    def start(self) -> "ProfilingSession":
+        if self.sampler:
+            self.sampler.start()
+        if self.profile:
+            self.profile.enable()
+        atexit.register(self.stop)
+        return self
+
+    def stop(self) -> None:
+        report = []
+        if self.profile:
+            self.profile.disable()
+            self.profile.dump_stats(f"{self.prefix}.prof")
+            for sort_key in ("tottime", "cumulative"):
+                stream = io.StringIO()
+                pstats.Stats(self.profile, stream=stream).sort_stats(sort_key).print_stats(self.top)
+                report += [f"=== cProfile, top {self.top} by {sort_key} ===", stream.getvalue()]
+
+        if self.sampler:
+            self.sampler.stop()
+            self.sampler.write_folded(f"{self.prefix}.folded")
+            report.append(f"=== Sampling profiler, {self.sampler.samples} samples, top {self.top} by self ===")
+            report += [f"{own:8d} {total:8d}  {frame}" for frame, own, total in self.sampler.top(self.top)]
+            report.append("")
+
+        if self.memory:
+            report += ["=== tracemalloc ===", self.memory.report(self.top)]
+
+        with open(f"{self.prefix}-top.txt", "w", encoding="utf-8") as top_file:
+            top_file.write("\n".join(report))
+        self.logger.info("Profile written to %s.*", self.prefix)
+
+
+def profiling_from_env(service_name: str, logger=None) -> Optional[ProfilingSession]:
+    """Start the profilers requested by PROFILE / PROFILE_MEMORY, or return None when both are off"""
+    mode = os.getenv("PROFILE", "").lower()
+    memory = os.getenv("PROFILE_MEMORY", "0") == "1"
+    if mode not in ("", "0", "cprofile", "sample", "both"):
+        raise ValueError(f"PROFILE must be cprofile, sample or both, got {mode!r}")
+    if mode in ("", "0") and not memory:
+        return None
+    return ProfilingSession(service_name, mode, memory, logger).start()
@@ -0,0 +1,190 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+
+# Status codes that mean "slow down"
+OVERLOAD_STATUS_CODES = {429, 502, 503, 504}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Return the seconds to wait from a Retry-After header (delta-seconds or HTTP date)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD limit on in-flight requests to one host.
+
+    Healthy responses grow the limit additively (by `increase` per full window of
+    responses); 429/5xx overload answers, connection errors and latency well above
+    the observed baseline cut it multiplicatively. Retry-After pauses new requests.
+    """
+
+    def __init__(
+        self,
+        host: str = "",
+        initial_limit: float = 4,
+        min_limit: float = 1,
+        max_limit: float = 32,
+        increase: float = 1,
+        decrease_factor: float = 0.5,
+        latency_tolerance: float = 2.0,
+        decrease_cooldown: float = 1.0,
+        logger=None,
+    ):
+        self.host = host
+        self.limit = float(initial_limit)
+        self.min_limit = float(min_limit)
+        self.max_limit = float(max_limit)
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.decrease_cooldown = decrease_cooldown
+        self.logger = logger
+
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.baseline_latency: Optional[float] = None
+        self.increases = 0
+        self.decreases = 0
+        self.last_decrease = 0.0
+        self.decisions = deque(maxlen=50)
+        self._condition = threading.Condition()
+
+    def acquire(self) -> None:
+        """Block until there is room for one more in-flight request"""
+        with self._condition:
+            while True:
+                pause = self.blocked_until - time.time()
+                if pause > 0:
+                    self._condition.wait(pause)
+                    continue
+                if self.in_flight < max(1, int(self.limit)):
+                    self.in_flight += 1
+                    return
+                self._condition.wait()
+
+    def release(self) -> None:
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def _record(self, action: str, old_limit: float, reason: str) -> None:
+        self.decisions.append({
+            "time": time.time(),
+            "host": self.host,
+            "action": action,
+            "old_limit": round(old_limit, 2),
+            "new_limit": round(self.limit, 2),
+            "reason": reason,
+        })
+
+    def _decrease(self, reason: str) -> None:
+        now = time.time()
+        # One overload episode usually fails many in-flight requests at once, cut only once for it
+        if now - self.last_decrease < self.decrease_cooldown:
+            return
+        old_limit = self.limit
+        self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+        self.last_decrease = now
+        self.decreases += 1
+        self._record("decrease", old_limit, reason)
+        if self.logger:
+            self.logger.info(f"Concurrency for {self.host} cut {old_limit:.1f} -> {self.limit:.1f} ({reason})")
+
+    def on_response(self, status_code: int, latency: float, retry_after: Optional[str] = None) -> None:
+        """Feed one response back into the controller"""
+        with self._condition:
+            pause = parse_retry_after(retry_after)
+            if pause:
+                self.blocked_until = max(self.blocked_until, time.time() + pause)
+
+            if status_code in OVERLOAD_STATUS_CODES:
+                self._decrease(f"status {status_code}")
+            elif self.baseline_latency and latency > self.baseline_latency * self.latency_tolerance:
+                self._decrease(f"latency {latency:.2f}s over baseline {self.baseline_latency:.2f}s")
+            else:
+                old_limit = self.limit
+                self.limit = min(self.max_limit, self.limit + self.increase / self.limit)
+                if int(self.limit) > int(old_limit):
+                    self.increases += 1
+                    self._record("increase", old_limit, "healthy responses")
+
+            # Slow EWMA of healthy latencies, so one spike does not move the baseline
+            if status_code < 500 and status_code != 429:
+                self.baseline_latency = latency if self.baseline_latency is None \
+                    else 0.9 * self.baseline_latency + 0.1 * latency
+
+            self._condition.notify_all()
+
+    def on_error(self) -> None:
+        """A request failed without a response (timeout, connection reset)"""
+        with self._condition:
+            self._decrease("connection error")
+            self._condition.notify_all()
+
+    def metrics(self) -> dict:
+        with self._condition:
+            return {
+                "host": self.host,
+                "limit": round(self.limit, 2),
+                "in_flight": self.in_flight,
+                "baseline_latency": self.baseline_latency,
+                "blocked_for": max(0.0, self.blocked_until - time.time()),
+                "increases": self.increases,
+                "decreases": self.decreases,
+                "recent_decisions": list(self.decisions),
+            }
+
+
+class AdaptiveConcurrencyController:
+    """Lazily creates one AdaptiveConcurrencyLimiter per host"""
+
+    def __init__(self, logger=None, **limiter_kwargs):
+        self.logger = logger
+        self.limiter_kwargs = limiter_kwargs
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def for_host(self, host: str) -> AdaptiveConcurrencyLimiter:
+        with self._lock:
+            if host not in self._limiters:
+                self._limiters[host] = AdaptiveConcurrencyLimiter(host=host, logger=self.logger, **self.limiter_kwargs)
+            return self._limiters[host]
+
+    def metrics(self) -> dict:
+        with self._lock:
+            limiters = list(self._limiters.values())
+        return {limiter.host: limiter.metrics() for limiter in limiters}
+
+
+def concurrency_controller_from_env(logger=None) -> Optional[AdaptiveConcurrencyController]:
+    """Build the controller from HTTP_ADAPTIVE_CONCURRENCY / HTTP_MAX_CONCURRENCY, or None if disabled"""
+    if os.getenv("HTTP_ADAPTIVE_CONCURRENCY", "1") != "1":
+        return None
+    return AdaptiveConcurrencyController(
+        logger=logger,
+        initial_limit=float(os.getenv("HTTP_INITIAL_CONCURRENCY", "4")),
+        max_limit=float(os.getenv("HTTP_MAX_CONCURRENCY", "32")),
+    )
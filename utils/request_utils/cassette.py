@@ -0,0 +1,189 @@
+"""Record/replay of HTTP exchanges at the HostAdapter level ("cassettes").
+
+    HTTP_CASSETTE=cassettes/run.jsonl.gz    cassette file, switches the feature on
+    HTTP_CASSETTE_MODE=record               send for real and append every exchange to the cassette
+    HTTP_CASSETTE_MODE=replay (default)     answer from the cassette, nothing leaves the machine
+    HTTP_CASSETTE_TIMING=fast (default)     replay as fast as possible
+    HTTP_CASSETTE_TIMING=original           sleep the recorded latency before every replayed response
+
+The file is a sequence of gzip members, one JSON line each, appended with a single
+write: a crashed run keeps everything recorded so far and several processes can
+record into one cassette. Delete the file to record from scratch.
+
+Request bodies are only stored as a sha256 hash, so passwords never reach the disk,
+but responses are stored as received, including session cookies and JWTs: treat
+cassettes like credentials. A replayed request is matched on method, URL and body
+hash; only a request carrying a password (the login POSTs, whose body also holds a
+per-run CSRF token) falls back to method and URL alone. Anything else that was not
+recorded raises CassetteMiss, e.g. a popup for a resume the recording never bumped.
+Recorded answers are used in order and the last one repeats once they run out.
+The websocket listener does not go through the adapter and is not recorded.
+"""
+import base64
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import List, Optional
+
+import requests
+
+MODES = ("record", "replay")
+TIMINGS = ("fast", "original")
+
+# The body is stored decoded, so these would describe bytes that are not there anymore
+_SKIPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+# A password field in a JSON or form-encoded body
+_CREDENTIAL_FIELD = re.compile(rb'"password"\s*:|(?:^|&)password=')
+
+
+class CassetteMiss(requests.exceptions.ConnectionError):
+    """Replay mode got a request that was never recorded"""
+
+
+def body_hash(body) -> Optional[str]:
+    if body is None:
+        return None
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    return hashlib.sha256(body).hexdigest() if isinstance(body, bytes) else None
+
+
+def is_credential(body) -> bool:
+    """True for login bodies, the only ones replayed without matching their hash"""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    return isinstance(body, bytes) and _CREDENTIAL_FIELD.search(body) is not None
+
+
+def _response_headers(response) -> List[list]:
+    """Every response header as [name, value] pairs, repeated Set-Cookie headers included"""
+    message = getattr(getattr(response.raw, "_original_response", None), "msg", None)
+    items = message.items() if message is not None else response.headers.items()
+    return [[name, value] for name, value in items if name.lower() not in _SKIPPED_HEADERS]
+
+
+class Interaction:
+    """One recorded request/response exchange"""
+
+    __slots__ = ("method", "url", "body_hash", "status", "reason", "headers", "content", "elapsed")
+
+    def __init__(self, method, url, body_hash, status, reason, headers, content, elapsed):
+        self.method = method
+        self.url = url
+        self.body_hash = body_hash
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.content = content
+        self.elapsed = elapsed
+
+    def to_dict(self) -> dict:
+        entry = {name: getattr(self, name) for name in self.__slots__ if name != "content"}
+        try:
+            entry["text"] = self.content.decode("utf-8")
+        except UnicodeDecodeError:
+            entry["base64"] = base64.b64encode(self.content).decode("ascii")
+        return entry
+
+    @classmethod
+    def from_dict(cls, entry: dict) -> "Interaction":
+        content = base64.b64decode(entry["base64"]) if "base64" in entry else entry.get("text", "").encode("utf-8")
+        return cls(entry["method"], entry["url"], entry.get("body_hash"), entry["status"], entry.get("reason"),
+                   entry.get("headers") or [], content, entry.get("elapsed") or 0.0)
+
+
+class Cassette:
+    """Recorded exchanges on disk; HostAdapter records into it or replays from it"""
+
+    def __init__(self, path: str, mode: str = "replay", timing: str = "fast", logger=None):
+        if mode not in MODES:
+            raise ValueError(f"Cassette mode must be one of {', '.join(MODES)}, got {mode!r}")
+        if timing not in TIMINGS:
+            raise ValueError(f"Cassette timing must be one of {', '.join(TIMINGS)}, got {timing!r}")
+        self.path = path
+        self.mode = mode
+        self.timing = timing
+        self.logger = logger
+        self._lock = threading.Lock()
+        self._interactions: List[Interaction] = []
+        self._index = defaultdict(list)
+        self._used = set()
+
+        if self.replaying:
+            self._load()
+        else:
+            directory = os.path.dirname(path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory, exist_ok=True)
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def _load(self) -> None:
+        with gzip.open(self.path, "rt", encoding="utf-8") as cassette_file:
+            for line in cassette_file:
+                if line.strip():
+                    self._add(Interaction.from_dict(json.loads(line)))
+        if self.logger:
+            self.logger.info("Replaying %d recorded HTTP exchanges from %s", len(self._interactions), self.path)
+
+    def _add(self, interaction: Interaction) -> None:
+        position = len(self._interactions)
+        self._interactions.append(interaction)
+        self._index[(interaction.method, interaction.url, interaction.body_hash)].append(position)
+        self._index[(interaction.method, interaction.url)].append(position)
+
+    def record(self, request, response, elapsed: float) -> None:
+        """Append one exchange; reads the response body if it was not read yet"""
+        interaction = Interaction(
+            request.method, request.url, body_hash(request.body), response.status_code, response.reason,
+            _response_headers(response), response.content or b"", round(elapsed, 4),
+        )
+        member = gzip.compress(json.dumps(interaction.to_dict(), ensure_ascii=False).encode("utf-8") + b"\n")
+        # One append-mode write per exchange, so concurrent writers never interleave inside a member
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        try:
+            os.write(fd, member)
+        finally:
+            os.close(fd)
+
+    def match(self, request) -> Interaction:
+        """Next recorded answer for the request; raises CassetteMiss if there is none"""
+        keys = [(request.method, request.url, body_hash(request.body))]
+        if is_credential(request.body):
+            keys.append((request.method, request.url))
+        with self._lock:
+            for key in keys:
+                positions = self._index.get(key)
+                if not positions:
+                    continue
+                position = next((position for position in positions if position not in self._used), positions[-1])
+                self._used.add(position)
+                return self._interactions[position]
+
+        if self.logger:
+            self.logger.error("No recorded response for %s %s in %s", request.method, request.url, self.path)
+        raise CassetteMiss(f"No recorded response for {request.method} {request.url}", request=request)
+
+    def wait(self, interaction: Interaction) -> None:
+        if self.timing == "original" and interaction.elapsed > 0:
+            time.sleep(interaction.elapsed)
+
+
+def cassette_from_env(logger=None) -> Optional[Cassette]:
+    """Cassette configured by HTTP_CASSETTE / HTTP_CASSETTE_MODE / HTTP_CASSETTE_TIMING, or None"""
+    path = os.getenv("HTTP_CASSETTE")
+    if not path:
+        return None
+    return Cassette(
+        path,
+        mode=os.getenv("HTTP_CASSETTE_MODE", "replay").lower(),
+        timing=os.getenv("HTTP_CASSETTE_TIMING", "fast").lower(),
+        logger=logger,
+    )
@@ -0,0 +1,133 @@
+import os
+import threading
+from collections import defaultdict
+
+import requests
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.poolmanager import PoolManager
+
+from utils.request_utils.request_metrics import TimedHTTPConnection, TimedHTTPSConnection
+
+
+class PoolStats:
+    """Per-host counters of requests sent and connections opened"""
+
+    def __init__(self):
+        self._requests = defaultdict(int)
+        self._new_connections = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record_request(self, host: str) -> None:
+        with self._lock:
+            self._requests[host] += 1
+
+    def record_new_connection(self, host: str) -> None:
+        with self._lock:
+            self._new_connections[host] += 1
+
+    def summary(self) -> dict:
+        """Requests, new connections and connection reuse ratio per host"""
+        with self._lock:
+            hosts = set(self._requests) | set(self._new_connections)
+            return {
+                host: {
+                    "requests": self._requests[host],
+                    "new_connections": self._new_connections[host],
+                    "reuse_ratio": round(1 - self._new_connections[host] / self._requests[host], 3)
+                    if self._requests[host] else 0.0,
+                }
+                for host in sorted(hosts)
+            }
+
+
+class _CountingPoolMixin:
+    pool_stats = None
+
+    def _new_conn(self):
+        if self.pool_stats:
+            self.pool_stats.record_new_connection(self.host)
+        return super()._new_conn()
+
+
+class CountingHTTPConnectionPool(_CountingPoolMixin, HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class CountingHTTPSConnectionPool(_CountingPoolMixin, HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class CountingPoolManager(PoolManager):
+    """PoolManager whose pools report every newly opened connection to a PoolStats"""
+
+    def __init__(self, *args, pool_stats=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool_stats = pool_stats
+        self.pool_classes_by_scheme = {
+            "http": CountingHTTPConnectionPool,
+            "https": CountingHTTPSConnectionPool,
+        }
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        pool = super()._new_pool(scheme, host, port, request_context=request_context)
+        pool.pool_stats = self.pool_stats
+        return pool
+
+
+def build_session(
+    pool_connections: int = 10,
+    pool_maxsize: int = 32,
+    pool_block: bool = False,
+    http2: bool = False,
+    adapter=None,
+    **adapter_kwargs,
+) -> requests.Session:
+    """Create a requests session whose http(s) traffic goes through one pooled HostAdapter.
+
+    `pool_connections` is the number of hosts kept pooled, `pool_maxsize` the number of
+    keep-alive connections per host; it should be at least the highest concurrency used
+    against one host, otherwise connections are dropped and re-opened with a new TLS handshake.
+    Passing an existing `adapter` shares its pools (and stats) between sessions, while
+    cookies stay separate per session.
+    """
+    from utils.request_utils.host_adapter import HostAdapter
+
+    if adapter is None:
+        adapter = HostAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+            http2=http2,
+            **adapter_kwargs,
+        )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def adapter_from_env(logger=None, **adapter_kwargs):
+    """Build a HostAdapter configured from HTTP_POOL_CONNECTIONS / HTTP_POOL_MAXSIZE / HTTP2
+    with the shared rate limiter, adaptive concurrency controller, request metrics and
+    the record/replay cassette (HTTP_CASSETTE)"""
+    from utils.request_utils.host_adapter import HostAdapter
+    from utils.request_utils.rate_limiter import rate_limiter_from_env
+    from utils.request_utils.adaptive_concurrency import concurrency_controller_from_env
+    from utils.request_utils.request_metrics import metrics_from_env
+    from utils.request_utils.cassette import cassette_from_env
+
+    adapter_kwargs.setdefault("rate_limiter", rate_limiter_from_env(logger))
+    adapter_kwargs.setdefault("concurrency_controller", concurrency_controller_from_env(logger))
+    adapter_kwargs.setdefault("metrics", metrics_from_env())
+    adapter_kwargs.setdefault("cassette", cassette_from_env(logger))
+    return HostAdapter(
+        pool_connections=int(os.getenv("HTTP_POOL_CONNECTIONS", "10")),
+        pool_maxsize=int(os.getenv("HTTP_POOL_MAXSIZE", "32")),
+        http2=os.getenv("HTTP2", "0") == "1",
+        **adapter_kwargs,
+    )
+
+
+def session_from_env(logger=None, **adapter_kwargs) -> requests.Session:
+    """Build a session on a fresh adapter_from_env adapter"""
+    return build_session(adapter=adapter_from_env(logger, **adapter_kwargs))
@@ -0,0 +1,212 @@
+import http.client
+import time
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from types import SimpleNamespace
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter, DEFAULT_POOLBLOCK
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers, select_proxy
+
+from utils.request_utils.connection_pool import PoolStats, CountingPoolManager
+from utils.request_utils.request_metrics import collect_timings, operation_for
+
+
+class HostAdapter(HTTPAdapter):
+    """HTTPAdapter that runs every outgoing request through per-host controls"""
+
+    def __init__(self, rate_limiter=None, concurrency_controller=None, pool_stats=None, http2=False,
+                 metrics=None, cassette=None, **kwargs):
+        self.rate_limiter = rate_limiter
+        self.concurrency_controller = concurrency_controller
+        self.pool_stats = pool_stats or PoolStats()
+        self.metrics = metrics
+        self.cassette = cassette
+        self.http2 = http2
+        self._http2_client = None
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=DEFAULT_POOLBLOCK, **pool_kwargs):
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+        self.poolmanager = CountingPoolManager(
+            num_pools=connections,
+            maxsize=maxsize,
+            block=block,
+            pool_stats=self.pool_stats,
+            **pool_kwargs,
+        )
+
+    def send(self, request, **kwargs):
+        if self.metrics is None:
+            return self._send_limited(request, **kwargs)
+
+        parsed = urlparse(request.url)
+        operation = operation_for(parsed.path)
+        status = "error"
+        bytes_in = 0
+        started = time.perf_counter()
+        with collect_timings() as timings:
+            try:
+                response = self._send_limited(request, timings=timings, **kwargs)
+                status = response.status_code
+                bytes_in = self._body_bytes(response, kwargs.get("stream", False))
+                return response
+            finally:
+                # Time spent waiting for a concurrency slot or rate token is reported as "queue", not "total"
+                timings["total"] = time.perf_counter() - started - timings.get("queue", 0.0)
+                body = request.body
+                bytes_out = len(body) if isinstance(body, (bytes, str)) else 0
+                self.metrics.record(parsed.hostname, operation, status, timings, bytes_out, bytes_in)
+
+    @staticmethod
+    def _body_bytes(response, stream: bool) -> int:
+        """Body bytes as received on the wire (compressed), reading the body unless streaming"""
+        if stream:
+            return int(response.headers.get("Content-Length") or 0)
+        content = response.content
+        tell = getattr(response.raw, "tell", None)
+        return tell() if callable(tell) else len(content or b"")
+
+    def _send_limited(self, request, timings=None, **kwargs):
+        if self.cassette is not None and self.cassette.replaying:
+            # Nothing goes on the wire, so no concurrency slot or rate token is taken
+            return self._replay(request)
+
+        host = urlparse(request.url).hostname
+        limiter = self.concurrency_controller.for_host(host) if self.concurrency_controller else None
+        queued_at = time.perf_counter()
+
+        # Take the concurrency slot first, so no rate token is burnt while waiting for it
+        if limiter:
+            limiter.acquire()
+        try:
+            if self.rate_limiter:
+                self.rate_limiter.acquire(host)
+            if timings is not None:
+                timings["queue"] = time.perf_counter() - queued_at
+
+            self.pool_stats.record_request(host)
+            started = time.monotonic()
+            try:
+                if self.http2 and self._http2_compatible(request, **kwargs):
+                    response = self._send_http2(request, **kwargs)
+                else:
+                    response = super().send(request, **kwargs)
+            except Exception:
+                if limiter:
+                    limiter.on_error()
+                raise
+
+            if limiter:
+                limiter.on_response(response.status_code, time.monotonic() - started,
+                                    response.headers.get("Retry-After"))
+            if self.cassette is not None:
+                self.cassette.record(request, response, time.monotonic() - started)
+            return response
+        finally:
+            if limiter:
+                limiter.release()
+
+    def _get_http2_client(self):
+        if self._http2_client is None:
+            try:
+                import httpx
+            except ImportError:
+                raise ImportError("HTTP/2 support needs httpx with the h2 extra: pip install 'httpx[http2]'")
+            self._http2_client = httpx.Client(
+                http2=True,
+                limits=httpx.Limits(max_connections=self._pool_maxsize * self._pool_connections,
+                                    max_keepalive_connections=self._pool_maxsize),
+                # The adapter is shared by many account sessions and each requests session owns its
+                # cookies, so the client must neither store nor send any of its own
+                cookies=CookieJar(policy=DefaultCookiePolicy(allowed_domains=[])),
+                # Proxy and CA settings from the environment are requests' to apply, see _http2_compatible
+                trust_env=False,
+            )
+        return self._http2_client
+
+    @staticmethod
+    def _http2_compatible(request, verify=True, cert=None, proxies=None, **kwargs) -> bool:
+        """The shared httpx client has fixed TLS and proxy settings; requests that need
+        others (custom CA bundle, client certificate, proxy) go over HTTP/1.1 instead"""
+        return verify is True and not cert and not select_proxy(request.url, proxies)
+
+    def _send_http2(self, request, stream=False, timeout=None, **kwargs):
+        """Send a prepared request over a multiplexed HTTP/2 connection and adapt the answer for requests"""
+        import httpx
+
+        client = self._get_http2_client()
+        host = urlparse(request.url).hostname
+
+        def trace(event, info):
+            # httpx keeps its own pool, report the connections it opens like the urllib3 pools do
+            if event == "connection.connect_tcp.complete":
+                self.pool_stats.record_new_connection(host)
+
+        if isinstance(timeout, tuple):
+            connect_timeout, read_timeout = timeout
+            timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        try:
+            http2_response = client.request(
+                request.method,
+                request.url,
+                headers=dict(request.headers),
+                content=request.body,
+                timeout=timeout,
+                extensions={"trace": trace},
+            )
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(e, request=request)
+        except httpx.HTTPError as e:
+            raise requests.exceptions.ConnectionError(e, request=request)
+
+        # httpx already decoded the body, so drop the content encoding header
+        headers = [(name, value) for name, value in http2_response.headers.multi_items()
+                   if name.lower() != "content-encoding"]
+        return self._build_response(request, http2_response.status_code, http2_response.reason_phrase,
+                                    headers, http2_response.content)
+
+    def _replay(self, request):
+        """Answer from the cassette instead of the network"""
+        interaction = self.cassette.match(request)
+        self.cassette.wait(interaction)
+        return self._build_response(request, interaction.status, interaction.reason,
+                                    interaction.headers, interaction.content)
+
+    def _build_response(self, request, status, reason, headers, content):
+        """requests.Response for a body that was not read from a urllib3 connection"""
+        response = requests.Response()
+        response.status_code = status
+        response.reason = reason
+        response.headers = CaseInsensitiveDict(headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = content
+        response._content_consumed = True
+        response.url = request.url
+        response.request = request
+        response.connection = self
+
+        # requests reads Set-Cookie headers from raw._original_response.msg
+        message = http.client.HTTPMessage()
+        for name, value in headers:
+            message[name] = value
+        response.raw = SimpleNamespace(_original_response=SimpleNamespace(msg=message))
+        requests.cookies.extract_cookies_to_jar(response.cookies, request, response.raw)
+        return response
+
+    def close(self):
+        super().close()
+        if self._http2_client is not None:
+            self._http2_client.close()
+            self._http2_client = None
+
+
+def mount_host_adapter(session, **kwargs):
+    """Route all http(s) traffic of a requests session through a HostAdapter"""
+    adapter = HostAdapter(**kwargs)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return adapter
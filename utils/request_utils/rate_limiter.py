@@ -0,0 +1,120 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+
+class TokenBucketRateLimiter:
+    """Per-host token bucket shared by threads, asyncio tasks and processes.
+
+    With `db_path` the bucket state lives in a small SQLite file, so every process
+    pointing at the same file draws from the same buckets. Without it the buckets
+    are kept in memory and shared by the threads of the current process only.
+    """
+
+    def __init__(
+        self,
+        rate: float = 5.0,
+        burst: int = 10,
+        host_limits: Optional[Dict[str, Tuple[float, int]]] = None,
+        db_path: Optional[str] = None,
+        logger=None,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.host_limits = host_limits or {}
+        self.db_path = db_path
+        self.logger = logger
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+
+        if self.db_path:
+            db_dir = os.path.dirname(self.db_path)
+            if db_dir and not os.path.exists(db_dir):
+                os.makedirs(db_dir, exist_ok=True)
+            connection = self._connection()
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (host TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        """One SQLite connection per thread (and per process after a fork)"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _limits(self, host: str) -> Tuple[float, int]:
+        return self.host_limits.get(host, (self.rate, self.burst))
+
+    @staticmethod
+    def _refill(tokens: float, updated: float, now: float, rate: float, burst: int) -> float:
+        return min(float(burst), tokens + (now - updated) * rate)
+
+    def _take(self, host: str) -> float:
+        """Try to take one token; return 0 on success or the seconds to wait before retrying"""
+        rate, burst = self._limits(host)
+        now = time.time()
+
+        if not self.db_path:
+            with self._lock:
+                tokens, updated = self._buckets.get(host, (float(burst), now))
+                tokens = self._refill(tokens, updated, now, rate, burst)
+                wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+                self._buckets[host] = (tokens - 1 if wait == 0 else tokens, now)
+                return wait
+
+        connection = self._connection()
+        # BEGIN IMMEDIATE takes the write lock, so read-modify-write is atomic across processes
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute("SELECT tokens, updated FROM buckets WHERE host = ?", (host,)).fetchone()
+            tokens, updated = row if row else (float(burst), now)
+            tokens = self._refill(tokens, updated, now, rate, burst)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            connection.execute(
+                "INSERT OR REPLACE INTO buckets (host, tokens, updated) VALUES (?, ?, ?)",
+                (host, tokens - 1 if wait == 0 else tokens, now),
+            )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return wait
+
+    def acquire(self, host: str) -> None:
+        """Block until a request to `host` is allowed"""
+        while True:
+            wait = self._take(host)
+            if wait <= 0:
+                return
+            if self.logger:
+                self.logger.debug(f"Rate limit reached for {host}, waiting {wait:.2f}s")
+            time.sleep(wait)
+
+    async def acquire_async(self, host: str) -> None:
+        """Wait without blocking the event loop until a request to `host` is allowed"""
+        while True:
+            # _take may wait on the SQLite write lock (BEGIN IMMEDIATE), keep it off the loop thread
+            wait = await asyncio.to_thread(self._take, host)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+
+def rate_limiter_from_env(logger=None) -> Optional[TokenBucketRateLimiter]:
+    """Build the shared limiter from HTTP_RATE_LIMIT / HTTP_RATE_BURST / HTTP_RATE_DB, or None if disabled"""
+    rate = float(os.getenv("HTTP_RATE_LIMIT", "5"))
+    if rate <= 0:
+        return None
+    return TokenBucketRateLimiter(
+        rate=rate,
+        burst=int(os.getenv("HTTP_RATE_BURST", "10")),
+        db_path=os.getenv("HTTP_RATE_DB", os.path.join("cache", "rate_limiter.sqlite")),
+        logger=logger,
+    )
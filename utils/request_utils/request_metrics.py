@@ -0,0 +1,294 @@
+"""Per-request timing, size and status metrics for the HTTP layer.
+
+HostAdapter records every request into a RequestMetrics, labelled by host and
+operation. The operation is the GraphQL operation name set with
+`operation_context` (Robota_API does this for every GraphQL call), or the URL
+path with numbers collapsed otherwise. Timings are histograms per phase:
+
+    queue               waiting for the adaptive concurrency slot and rate limiter token
+    dns, connect, tls   only for requests that opened a new connection
+    ttfb                request fully sent -> response headers received
+    total               send -> body read, without the queue time
+
+The timed urllib3 connection classes below fill the phases of the request in
+flight on the current thread. Results are exported as a Prometheus text file
+(.prom) or a JSON summary (.json) at the end of a run.
+"""
+import contextlib
+import contextvars
+import json
+import os
+import re
+import socket
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Optional
+
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.exceptions import NewConnectionError
+from urllib3.util.connection import allowed_gai_family
+
+
+PHASES = ("queue", "dns", "connect", "tls", "ttfb", "total")
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float("inf"))
+
+_operation = contextvars.ContextVar("http_operation", default=None)
+_local = threading.local()
+
+
+@contextlib.contextmanager
+def operation_context(name: str):
+    """Label every request sent inside the block with operation `name`"""
+    token = _operation.set(name)
+    try:
+        yield
+    finally:
+        _operation.reset(token)
+
+
+def operation_for(url_path: str) -> str:
+    """Current operation name, or the URL path with IDs collapsed to keep label cardinality low"""
+    return _operation.get() or re.sub(r"\d+", ":id", url_path or "/")
+
+
+@contextlib.contextmanager
+def collect_timings():
+    """Collect the phase timings of the request sent on this thread inside the block"""
+    timings = {}
+    _local.timings = timings
+    try:
+        yield timings
+    finally:
+        _local.timings = None
+
+
+def _current_timings() -> Optional[dict]:
+    return getattr(_local, "timings", None)
+
+
+class _TimedConnectionMixin:
+    def _new_conn(self):
+        timings = _current_timings()
+        if timings is None:
+            return super()._new_conn()
+
+        started = time.perf_counter()
+        try:
+            addresses = socket.getaddrinfo(self._dns_host.strip("[]"), self.port,
+                                           allowed_gai_family(), socket.SOCK_STREAM)
+        except OSError:
+            # Let urllib3 resolve again and raise its usual NameResolutionError
+            return super()._new_conn()
+        resolved = time.perf_counter()
+        timings["dns"] = resolved - started
+
+        # Connect to the address we just resolved, so the name is not looked up twice.
+        # self.host is derived from _dns_host, but TLS/SNI only read it after _new_conn returns.
+        dns_host = self._dns_host
+        self._dns_host = addresses[0][4][0]
+        try:
+            sock = super()._new_conn()
+        except NewConnectionError:
+            # First address refused: fall back to urllib3 trying every address
+            self._dns_host = dns_host
+            sock = super()._new_conn()
+        finally:
+            self._dns_host = dns_host
+        timings["connect"] = time.perf_counter() - resolved
+        return sock
+
+    def connect(self):
+        timings = _current_timings()
+        started = time.perf_counter()
+        super().connect()
+        if timings is not None and isinstance(self, HTTPSConnection):
+            tcp_time = timings.get("dns", 0.0) + timings.get("connect", 0.0)
+            timings["tls"] = max(0.0, time.perf_counter() - started - tcp_time)
+
+    def request(self, *args, **kwargs):
+        super().request(*args, **kwargs)
+        timings = _current_timings()
+        if timings is not None:
+            timings["sent_at"] = time.perf_counter()
+
+    def getresponse(self, *args, **kwargs):
+        response = super().getresponse(*args, **kwargs)
+        timings = _current_timings()
+        if timings is not None and "sent_at" in timings:
+            timings["ttfb"] = time.perf_counter() - timings["sent_at"]
+        return response
+
+
+class TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for index, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def merge(self, counts, total, count) -> None:
+        self.counts = [own + other for own, other in zip(self.counts, counts)]
+        self.sum += total
+        self.count += count
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, bucket_count in zip(BUCKETS, self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return bound
+        return BUCKETS[-1]
+
+
+class RequestMetrics:
+    """Thread-safe histograms and counters keyed by (host, operation)"""
+
+    def __init__(self):
+        self._histograms: Dict[tuple, Histogram] = defaultdict(Histogram)
+        self._statuses: Dict[tuple, int] = defaultdict(int)
+        self._bytes: Dict[tuple, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, host: str, operation: str, status, timings: dict, bytes_out: int = 0, bytes_in: int = 0):
+        """`status` is the HTTP status code, or "error" when no response came back"""
+        with self._lock:
+            for phase in PHASES:
+                if phase in timings:
+                    self._histograms[(host, operation, phase)].observe(timings[phase])
+            self._statuses[(host, operation, str(status))] += 1
+            self._bytes[(host, operation, "out")] += bytes_out
+            self._bytes[(host, operation, "in")] += bytes_in
+
+    def snapshot(self, reset: bool = False) -> dict:
+        """Picklable raw state, e.g. to send from fleet workers to the parent process.
+
+        With `reset` the metrics start over, so consecutive snapshots can be merged without double counting.
+        """
+        with self._lock:
+            snapshot = {
+                "histograms": [[*key, histogram.counts, histogram.sum, histogram.count]
+                               for key, histogram in self._histograms.items()],
+                "statuses": [[*key, count] for key, count in self._statuses.items()],
+                "bytes": [[*key, count] for key, count in self._bytes.items()],
+            }
+            if reset:
+                self._histograms.clear()
+                self._statuses.clear()
+                self._bytes.clear()
+            return snapshot
+
+    def merge(self, snapshot: dict) -> None:
+        with self._lock:
+            for host, operation, phase, counts, total, count in snapshot["histograms"]:
+                self._histograms[(host, operation, phase)].merge(counts, total, count)
+            for host, operation, status, count in snapshot["statuses"]:
+                self._statuses[(host, operation, status)] += count
+            for host, operation, direction, count in snapshot["bytes"]:
+                self._bytes[(host, operation, direction)] += count
+
+    def summary(self) -> dict:
+        """{host: {operation: {requests, statuses, bytes_in, bytes_out, phases: {phase: stats}}}}"""
+        summary = {}
+        with self._lock:
+            for (host, operation, status), count in self._statuses.items():
+                entry = summary.setdefault(host, {}).setdefault(
+                    operation, {"requests": 0, "statuses": {}, "bytes_in": 0, "bytes_out": 0, "phases": {}})
+                entry["requests"] += count
+                entry["statuses"][status] = count
+            for (host, operation, direction), count in self._bytes.items():
+                summary[host][operation][f"bytes_{direction}"] = count
+            for (host, operation, phase), histogram in self._histograms.items():
+                summary[host][operation]["phases"][phase] = {
+                    "count": histogram.count,
+                    "mean": round(histogram.sum / histogram.count, 4) if histogram.count else None,
+                    "p50": histogram.quantile(0.5),
+                    "p95": histogram.quantile(0.95),
+                    "p99": histogram.quantile(0.99),
+                }
+        return summary
+
+    def to_prometheus(self) -> str:
+        def labels(**values):
+            return ",".join(f'{name}="{str(value).replace(chr(34), chr(39))}"' for name, value in values.items())
+
+        lines = [
+            "# HELP http_client_request_duration_seconds HTTP client request phase durations",
+            "# TYPE http_client_request_duration_seconds histogram",
+        ]
+        with self._lock:
+            for (host, operation, phase), histogram in sorted(self._histograms.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(BUCKETS, histogram.counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"http_client_request_duration_seconds_bucket"
+                                 f"{{{labels(host=host, operation=operation, phase=phase, le=le)}}} {cumulative}")
+                lines.append(f"http_client_request_duration_seconds_sum"
+                             f"{{{labels(host=host, operation=operation, phase=phase)}}} {histogram.sum:.6f}")
+                lines.append(f"http_client_request_duration_seconds_count"
+                             f"{{{labels(host=host, operation=operation, phase=phase)}}} {histogram.count}")
+
+            lines += ["# HELP http_client_requests_total HTTP client requests by status",
+                      "# TYPE http_client_requests_total counter"]
+            for (host, operation, status), count in sorted(self._statuses.items()):
+                lines.append(f"http_client_requests_total{{{labels(host=host, operation=operation, status=status)}}} "
+                             f"{count}")
+
+            lines += ["# HELP http_client_bytes_total HTTP client body bytes sent and received",
+                      "# TYPE http_client_bytes_total counter"]
+            for (host, operation, direction), count in sorted(self._bytes.items()):
+                lines.append(f"http_client_bytes_total"
+                             f"{{{labels(host=host, operation=operation, direction=direction)}}} {count}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: str) -> None:
+        """Write a Prometheus text file (.prom/.txt) or a JSON summary (anything else), atomically"""
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        if path.endswith((".prom", ".txt")):
+            content = self.to_prometheus()
+        else:
+            content = json.dumps(self.summary(), indent=2, sort_keys=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as metrics_file:
+            metrics_file.write(content)
+        os.replace(tmp_path, path)
+
+
+def metrics_from_env() -> Optional[RequestMetrics]:
+    """RequestMetrics when HTTP_METRICS_FILE is set, None (instrumentation off) otherwise"""
+    return RequestMetrics() if os.getenv("HTTP_METRICS_FILE") else None
+
+
+def export_metrics(metrics: Optional[RequestMetrics], logger=None) -> None:
+    """Write the metrics to HTTP_METRICS_FILE, if instrumentation is on"""
+    path = os.getenv("HTTP_METRICS_FILE")
+    if metrics is None or not path:
+        return
+    metrics.export(path)
+    if logger:
+        logger.info("HTTP metrics written to %s", path)
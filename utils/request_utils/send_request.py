@@ -1,21 +1,11 @@
-import requests
+from utils.request_utils.transport import transport_for
 
 # Utility function to send requests
 def send_request(logger, session, method, url, headers=None, data=None, json_data=None):
-    try:
-        if method == "GET":
-            response = session.get(url, headers=headers)
-        elif method == "POST":
-            response = session.post(url, headers=headers, data=data, json=json_data)
-        else:
-            raise ValueError(f"Unsupported HTTP method: {method}")
+    if method not in ("GET", "POST"):
+        raise ValueError(f"Unsupported HTTP method: {method}")
 
-        if response.status_code == 200:
-            return response
-        else:
-            logger.error(f"Request to {url} failed with status code: {response.status_code}")
-            logger.error(response.text[:500])
-            return None
-    except requests.exceptions.RequestException as e:
-        logger.error(f"An error occurred during {method} request to {url}: {e}")
-        return None
\ No newline at end of file
+    # Retries, timeouts and error logging live in the transport shared by all clients of the session
+    return transport_for(session, logger).request(
+        method, url, expected_status=(200,), headers=headers, data=data, json=json_data
+    )
@@ -0,0 +1,204 @@
+import logging
+import random
+import threading
+import time
+import weakref
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlparse
+
+import requests
+
+from utils.request_utils.adaptive_concurrency import parse_retry_after
+
+
+# (connect, read) timeouts in seconds, per host
+DEFAULT_TIMEOUTS = {
+    "auth-api.robota.ua": (5, 15),
+    "dracula.robota.ua": (5, 30),
+    "djinni.co": (5, 10),
+}
+DEFAULT_TIMEOUT = (5, 20)
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class CircuitBreaker:
+    """Per-host circuit breaker: after `failure_threshold` consecutive failures the host
+    is skipped for `reset_timeout` seconds, then a single probe request is let through."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures: Dict[str, int] = {}
+        self._opened_at: Dict[str, float] = {}
+        self._probing = set()
+        self._lock = threading.Lock()
+
+    def allow(self, host: str) -> bool:
+        with self._lock:
+            opened_at = self._opened_at.get(host)
+            if opened_at is None:
+                return True
+            # Half-open: let exactly one probe through once the timeout has passed
+            if time.monotonic() - opened_at >= self.reset_timeout and host not in self._probing:
+                self._probing.add(host)
+                return True
+            return False
+
+    def record_success(self, host: str) -> None:
+        with self._lock:
+            self._failures.pop(host, None)
+            self._opened_at.pop(host, None)
+            self._probing.discard(host)
+
+    def record_failure(self, host: str) -> bool:
+        """Count a failure, return True if this opened the circuit"""
+        with self._lock:
+            self._failures[host] = self._failures.get(host, 0) + 1
+            reopened = host in self._probing
+            self._probing.discard(host)
+            if reopened or self._failures[host] >= self.failure_threshold:
+                self._opened_at[host] = time.monotonic()
+                return True
+            return False
+
+    def state(self, host: str) -> str:
+        with self._lock:
+            if host in self._probing:
+                return "half-open"
+            return "open" if host in self._opened_at else "closed"
+
+
+# One breaker per process: the accounts of a fleet or daemon each have their own session,
+# but a failing host should stop all of them, not each after its own run of failures
+default_circuit_breaker = CircuitBreaker()
+
+
+class Transport:
+    """Shared request path for all API clients: per-host timeouts, retries with
+    exponential backoff and full jitter for idempotent calls, and circuit breaking.
+    Retries and the last status are per session; the circuit breaker is shared by
+    every Transport of the process unless one is passed in.
+
+    `request` returns the response when its status is expected and None otherwise,
+    after logging the failure, which is the contract the clients already relied on.
+    """
+
+    def __init__(
+        self,
+        session: requests.Session,
+        logger=None,
+        timeouts: Optional[dict] = None,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 10.0,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.session = session
+        self.logger = logger or logging.getLogger(__name__)
+        self.timeouts = {**DEFAULT_TIMEOUTS, **(timeouts or {})}
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.circuit_breaker = circuit_breaker or default_circuit_breaker
+        self._local = threading.local()
+
+    @property
+    def last_status_code(self) -> Optional[int]:
+        """Status of the last response received by the calling thread"""
+        return getattr(self._local, "status_code", None)
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        server_delay = parse_retry_after(retry_after)
+        return max(delay, server_delay) if server_delay is not None else delay
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        expected_status: Optional[Iterable[int]] = None,
+        idempotent: Optional[bool] = None,
+        **kwargs,
+    ) -> Optional[requests.Response]:
+        """Send a request; `expected_status=None` accepts any non-error (< 400) status"""
+        host = urlparse(url).hostname
+        kwargs.setdefault("timeout", self.timeouts.get(host, DEFAULT_TIMEOUT))
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        attempts = 1 + (self.max_retries if idempotent else 0)
+        self._local.status_code = None
+
+        for attempt in range(attempts):
+            if not self.circuit_breaker.allow(host):
+                self.logger.error("Circuit open for %s, skipping %s request to %s", host, method, url,
+                                  extra={"host": host, "method": method})
+                return None
+
+            is_last = attempt == attempts - 1
+            started = time.monotonic()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.exceptions.RequestException as e:
+                self._record_failure(host)
+                if is_last:
+                    self.logger.error("An error occurred during %s request to %s: %s", method, url, e,
+                                      extra={"host": host, "method": method})
+                    return None
+                delay = self._backoff(attempt)
+                self.logger.warning("%s request to %s failed (%s), retrying in %.1fs", method, url, e, delay,
+                                    extra={"host": host, "method": method})
+                time.sleep(delay)
+                continue
+
+            self._local.status_code = response.status_code
+            ok = response.status_code in expected_status if expected_status is not None else response.ok
+            if ok:
+                self.circuit_breaker.record_success(host)
+                latency = time.monotonic() - started
+                self.logger.debug("%s %s -> %s in %.3fs", method, url, response.status_code, latency,
+                                  extra={"host": host, "method": method, "status": response.status_code,
+                                         "latency": round(latency, 4)})
+                return response
+
+            if response.status_code in RETRYABLE_STATUS_CODES:
+                self._record_failure(host)
+                if not is_last:
+                    delay = self._backoff(attempt, response.headers.get("Retry-After"))
+                    self.logger.warning("%s request to %s returned %s, retrying in %.1fs",
+                                        method, url, response.status_code, delay,
+                                        extra={"host": host, "method": method, "status": response.status_code})
+                    time.sleep(delay)
+                    continue
+            else:
+                # The host answered, it is healthy even if this request was rejected
+                self.circuit_breaker.record_success(host)
+
+            self.logger.error("%s request to %s failed with status code: %s", method, url, response.status_code,
+                              extra={"host": host, "method": method, "status": response.status_code})
+            # Bodies can hold credentials echoed by auth endpoints or whole HTML error pages
+            self.logger.debug("%.500s", response.text, extra={"host": host, "status": response.status_code})
+            return None
+
+        return None
+
+    def _record_failure(self, host: str) -> None:
+        if self.circuit_breaker.record_failure(host):
+            self.logger.error("Circuit opened for %s after repeated failures", host, extra={"host": host})
+
+
+_transports = weakref.WeakKeyDictionary()
+_transports_lock = threading.Lock()
+
+
+def transport_for(session: requests.Session, logger=None,
+                  circuit_breaker: Optional[CircuitBreaker] = None) -> Transport:
+    """Return the Transport bound to a session, so every client on it shares its retries;
+    the circuit breaker is the process-wide default_circuit_breaker unless one is given"""
+    with _transports_lock:
+        transport = _transports.get(session)
+        if transport is None:
+            transport = Transport(session, logger=logger, circuit_breaker=circuit_breaker)
+            _transports[session] = transport
+        return transport
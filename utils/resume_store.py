@@ -0,0 +1,111 @@
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, List, Optional
+
+
+class ResumeStore:
+    """Local SQLite snapshot of SeekerResumes, one row per (account, resume id).
+
+    `sync` diffs a fresh fetch against the snapshot and only writes what changed,
+    so later steps (active IDs, analytics) can read the store instead of refetching.
+    """
+
+    def __init__(self, db_path: str = os.path.join("cache", "resumes.sqlite")):
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir, exist_ok=True)
+        self.connection = sqlite3.connect(db_path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(
+            """
+            PRAGMA journal_mode = WAL;
+            CREATE TABLE IF NOT EXISTS resumes (
+                account TEXT NOT NULL,
+                -- no declared type, so IDs keep the type the API returned (int or str)
+                id NOT NULL,
+                title TEXT,
+                state TEXT,
+                update_date TEXT,
+                payload TEXT NOT NULL,
+                synced_at REAL NOT NULL,
+                PRIMARY KEY (account, id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_resumes_state ON resumes (state, account);
+            CREATE INDEX IF NOT EXISTS idx_resumes_update_date ON resumes (update_date);
+            """
+        )
+
+    @staticmethod
+    def _row(account: str, resume, synced_at: float) -> tuple:
+        return (
+            account,
+            resume.id,
+            resume.title,
+            resume.state.state,
+            resume.update_date,
+            json.dumps(resume.to_dict(), sort_keys=True, ensure_ascii=False),
+            synced_at,
+        )
+
+    def sync(self, account: str, resumes: list) -> Dict[str, list]:
+        """Upsert new and changed Resume records, delete vanished ones; return the changed IDs"""
+        existing = {
+            row["id"]: row["payload"]
+            for row in self.connection.execute("SELECT id, payload FROM resumes WHERE account = ?", (account,))
+        }
+
+        now = time.time()
+        changes = {"added": [], "updated": [], "removed": []}
+        rows = []
+        for resume in resumes:
+            row = self._row(account, resume, now)
+            resume_id, payload = row[1], row[5]
+            if resume_id not in existing:
+                changes["added"].append(resume_id)
+                rows.append(row)
+            elif existing[resume_id] != payload:
+                changes["updated"].append(resume_id)
+                rows.append(row)
+        fetched_ids = {resume.id for resume in resumes}
+        changes["removed"] = [resume_id for resume_id in existing if resume_id not in fetched_ids]
+
+        with self.connection:
+            self.connection.executemany(
+                """INSERT INTO resumes (account, id, title, state, update_date, payload, synced_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (account, id) DO UPDATE SET
+                       title = excluded.title, state = excluded.state, update_date = excluded.update_date,
+                       payload = excluded.payload, synced_at = excluded.synced_at""",
+                rows,
+            )
+            self.connection.executemany(
+                "DELETE FROM resumes WHERE account = ? AND id = ?",
+                [(account, resume_id) for resume_id in changes["removed"]],
+            )
+        return changes
+
+    def ids_by_state(self, account: str, state: str = "ACTIVE") -> list:
+        return [
+            row["id"]
+            for row in self.connection.execute(
+                "SELECT id FROM resumes WHERE state = ? AND account = ? ORDER BY id", (state, account)
+            )
+        ]
+
+    def resumes(self, account: Optional[str] = None, state: Optional[str] = None) -> List[dict]:
+        """Stored resume payloads, optionally filtered, most recently updated first"""
+        query = "SELECT payload FROM resumes WHERE 1 = 1"
+        params = []
+        if account is not None:
+            query += " AND account = ?"
+            params.append(account)
+        if state is not None:
+            query += " AND state = ?"
+            params.append(state)
+        query += " ORDER BY update_date DESC"
+        return [json.loads(row["payload"]) for row in self.connection.execute(query, params)]
+
+    def close(self) -> None:
+        self.connection.close()